@@ -0,0 +1,78 @@
+import functools
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from engine import ArrayModel
+from engine.aggregate import ReplicateAggregator
+from engine.netcache import load_compiled
+from engine.output import RunDataset
+from engine.runner import run_replicates, write_rows_csv
+
+
+# Define the number of agents for each node
+agents_per_node = {i: 10 for i in range(11)}  # 10 agents per node, 11 nodes
+
+# Number of runs
+num_runs = 10
+
+# Master seed, the same seed reproduces every run bit for bit
+master_seed = 20250214
+
+# 'parquet' writes all runs to one Parquet dataset (needs pyarrow), 'csv' one CSV file per run
+output_format = 'parquet'
+
+# Runs are checkpointed every checkpoint_every steps. Running the script again resumes a
+# killed batch: saved runs are skipped and the others continue from their checkpoints.
+checkpoint_dir = 'Runs/checkpoints_20250214'
+checkpoint_every = 100
+
+
+if __name__ == '__main__':
+    # The edge lists are checked and compiled on the first run only, later runs and the
+    # worker processes memory-map the compiled arrays (cached in __netcache__)
+    network = load_compiled('days_network_full.csv', incoming='incoming_customs_network.csv',
+                            outgoing='outgoing_customs_network.csv')
+    make_model = functools.partial(ArrayModel, None, agents_per_node, network=network)
+
+    if not os.path.exists('Runs'):
+        os.makedirs('Runs')
+
+    id_average_output_file = 'Runs/agents_hist_protectionism_id_averages_20250214.csv'
+    class_average_output_file = 'Runs/agents_hist_protectionism_class_averages_20250214.csv'
+    if output_format == 'parquet':
+        dataset = RunDataset('Runs/agents_hist_protectionism_20250214.parquet')
+
+    def run_file(run):
+        return f'Runs/agents_hist_protectionism_run_{run}_20250214.csv'
+
+    # Replicates run on all cores, every run reuses the behaviors drawn for the first one.
+    # The averages are updated as runs complete, so the files always cover the runs so far.
+    aggregator = ReplicateAggregator()
+    if output_format == 'parquet':
+        done = [run for run in dataset.runs() if run <= num_runs]
+        for run in done:
+            aggregator.update(dataset.read(runs=[run]).dropna(axis=1, how='all').to_dict('records'))
+    else:
+        done = [run for run in range(1, num_runs + 1) if os.path.exists(run_file(run))]
+        for run in done:
+            aggregator.update(pd.read_csv(run_file(run)).to_dict('records'))
+    if done:
+        print(f"Resuming, runs {done} already completed.")
+
+    for run, rows in run_replicates(make_model, num_runs, seed=master_seed, checkpoint_dir=checkpoint_dir,
+                                    checkpoint_every=checkpoint_every, skip_runs=done):
+        if output_format == 'parquet':
+            output_filename = dataset.write_run(run, rows)
+        else:
+            output_filename = run_file(run)
+            write_rows_csv(output_filename, rows)
+        print(f"Run {run} completed. Results saved to: {output_filename}")
+        aggregator.update(rows)
+        aggregator.write(id_average_output_file, class_average_output_file)
+
+    print("All runs completed.")
+    print(f"Averages by Agent ID saved to: {id_average_output_file}")
+    print(f"Averages by Agent Class saved to: {class_average_output_file}")
@@ -0,0 +1,7 @@
+"""Array-backed simulation engine shared by the scenario models."""
+from .agents import (AgentAdria, AgentAegean, AgentBaetica, AgentEM, AgentEgypt, AgentGallia, AgentIberia,
+                     AgentItaly, AgentNA, AgentPrivate, AgentState, AgentTarr, AgentView, AgentWM)
+from .behaviors import aggressive_trade, conservative_trade, random_trade
+from .model import ArrayModel
+from .network import CompiledNetwork
+from .regions import AGENT_CLASSES, HISTORICAL_PRICES, REGIONS, UNIFORM_PRICES
@@ -0,0 +1,149 @@
+from .behaviors import BEHAVIORS
+from .regions import AGENT_CLASSES
+
+
+class AgentView:
+    """
+    Compatibility view of one row of an ArrayModel.
+
+    Exposes the attributes the old mesa agents had (wealth, goods_list, active, ...) so
+    that the run scripts and any ad-hoc analysis keep working. All state lives in the
+    model's arrays, a view only stores the row index.
+    """
+    __slots__ = ('model', 'index')
+
+    def __init__(self, model, index):
+        self.model = model
+        self.index = index
+
+    def __repr__(self):
+        return f"{type(self).__name__}(unique_id={self.unique_id})"
+
+    @property
+    def unique_id(self):
+        return int(self.model.unique_id[self.index])
+
+    @property
+    def type(self):
+        return AGENT_CLASSES[self.model.region[self.index]].type
+
+    @property
+    def type_id(self):
+        return int(self.model.type_id[self.index])
+
+    @property
+    def pos(self):
+        return self.model.nodes[self.model.pos[self.index]]
+
+    @property
+    def wealth(self):
+        return float(self.model.wealth[self.index])
+
+    @wealth.setter
+    def wealth(self, value):
+        self.model.wealth[self.index] = value
+
+    @property
+    def active(self):
+        return bool(self.model.active[self.index])
+
+    @active.setter
+    def active(self, value):
+        self.model.set_active(self.index, value)
+
+    @property
+    def has_traded(self):
+        return bool(self.model.has_traded[self.index])
+
+    @has_traded.setter
+    def has_traded(self, value):
+        self.model.has_traded[self.index] = value
+
+    @property
+    def agent_behavior(self):
+        return BEHAVIORS[self.model.behavior[self.index]]
+
+    @property
+    def goods_list(self):
+        """Snapshot of the agent's goods as the old list of (name, quantity, price) tuples."""
+        return self.model.inventory.goods_list(self.index)
+
+    @property
+    def movement_history(self):
+        """Nodes the agent moved to, an empty list if the model does not record them."""
+        history = self.model.history
+        return history.agent(self.index) if history is not None else []
+
+    @property
+    def last_traveled_incoming_customs_edge_weight(self):
+        return float(self.model.last_incoming[self.index])
+
+    @property
+    def last_traveled_outgoing_customs_edge_weight(self):
+        return float(self.model.last_outgoing[self.index])
+
+    @property
+    def last_traveled_transport_edge_weight(self):
+        return float(self.model.last_transport[self.index])
+
+    def step(self):
+        '''Moves the agent to the neighboring node with the lowest travel cost among 5 randomly selected options.'''
+        self.model.move_agent(self.index)
+
+
+#one view class per region, named like the old agent classes
+class AgentAdria(AgentView):
+    __slots__ = ()
+
+
+class AgentAegean(AgentView):
+    __slots__ = ()
+
+
+class AgentBaetica(AgentView):
+    __slots__ = ()
+
+
+class AgentEM(AgentView):
+    __slots__ = ()
+
+
+class AgentEgypt(AgentView):
+    __slots__ = ()
+
+
+class AgentGallia(AgentView):
+    __slots__ = ()
+
+
+class AgentIberia(AgentView):
+    __slots__ = ()
+
+
+class AgentItaly(AgentView):
+    __slots__ = ()
+
+
+class AgentNA(AgentView):
+    __slots__ = ()
+
+
+class AgentTarr(AgentView):
+    __slots__ = ()
+
+
+class AgentWM(AgentView):
+    __slots__ = ()
+
+
+class AgentPrivate(AgentView):
+    __slots__ = ()
+
+
+class AgentState(AgentView):
+    __slots__ = ()
+
+
+# in AGENT_CLASSES order
+VIEW_CLASSES = (AgentAdria, AgentAegean, AgentBaetica, AgentEM, AgentEgypt, AgentGallia,
+                AgentIberia, AgentItaly, AgentNA, AgentTarr, AgentWM, AgentPrivate, AgentState)
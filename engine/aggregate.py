@@ -0,0 +1,156 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.stats import t as student_t
+except ImportError:  # without scipy the intervals use the normal approximation
+    student_t = None
+
+ID_KEYS = ['Agent ID', 'Agent Class', 'Trade Behavior', 'Active']
+CLASS_KEYS = ['Agent Class']
+SKIPPED_COLUMNS = ['Run', 'Step Count']
+ID_ONLY_COLUMNS = ['Agent ID', 'Trade Behavior', 'Active']
+
+
+class RunningStats:
+    """
+    Running count, mean and variance of value columns per group (Welford / Chan).
+
+    Each update() merges a batch of rows into the per-group statistics, so nothing but
+    (groups x columns) numbers is kept however many runs are added. A value is missing
+    when its column is absent from a batch; counts are kept per column, so a missing
+    value is skipped like a NaN in a pandas mean.
+    """
+
+    def __init__(self, keys):
+        """
+        :param keys: Columns the rows are grouped by.
+        """
+        self.keys = list(keys)
+        self.columns = []
+        self.groups = {}  # key tuple -> group row
+        self.count = np.zeros((0, 0), dtype=np.int64)
+        self.mean = np.zeros((0, 0))
+        self.m2 = np.zeros((0, 0))  # sum of squared deviations from the mean
+
+    def _grow(self, num_groups, num_columns):
+        old_groups, old_columns = self.count.shape
+        if num_groups <= old_groups and num_columns <= old_columns:
+            return
+        for name in ('count', 'mean', 'm2'):
+            old = getattr(self, name)
+            new = np.zeros((max(num_groups, 2 * old_groups), max(num_columns, old_columns)), dtype=old.dtype)
+            new[:old_groups, :old_columns] = old
+            setattr(self, name, new)
+
+    def update(self, rows):
+        """Add a batch of rows (dicts with the key columns and value columns)."""
+        if not rows:
+            return
+        for name in rows[0]:
+            if name not in self.keys and name not in SKIPPED_COLUMNS and name not in self.columns:
+                self.columns.append(name)
+
+        group = np.empty(len(rows), dtype=np.int64)
+        for r, row in enumerate(rows):
+            key = tuple(row[name] for name in self.keys)
+            group[r] = self.groups.setdefault(key, len(self.groups))
+        num_groups = len(self.groups)
+        self._grow(num_groups, len(self.columns))
+
+        for c, name in enumerate(self.columns):
+            if name not in rows[0]:
+                continue
+            x = np.array([row[name] for row in rows], dtype=np.float64)
+            n_b = np.bincount(group, minlength=num_groups).astype(np.int64)
+            seen = n_b > 0
+            mean_b = np.zeros(num_groups)
+            mean_b[seen] = np.bincount(group, weights=x, minlength=num_groups)[seen] / n_b[seen]
+            m2_b = np.bincount(group, weights=(x - mean_b[group]) ** 2, minlength=num_groups)
+
+            # Chan et al.: merge the batch statistics into the running ones
+            n_a = self.count[:num_groups, c]
+            n = n_a + n_b
+            delta = mean_b - self.mean[:num_groups, c]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                share = np.where(n > 0, n_b / n, 0.0)
+            self.mean[:num_groups, c] += delta * share
+            self.m2[:num_groups, c] += m2_b + delta ** 2 * n_a * share
+            self.count[:num_groups, c] = n
+
+    def _frame(self, values):
+        index = pd.MultiIndex.from_tuples(list(self.groups), names=self.keys) if len(self.keys) > 1 \
+            else pd.Index([key[0] for key in self.groups], name=self.keys[0])
+        return pd.DataFrame(values[:len(self.groups)], index=index, columns=self.columns).sort_index()
+
+    def counts(self):
+        return self._frame(self.count)
+
+    def means(self):
+        """Group means, laid out like DataFrame.groupby(keys).mean() of all rows added."""
+        n = self.count[:len(self.groups)]
+        return self._frame(np.where(n > 0, self.mean[:len(self.groups)], np.nan))
+
+    def variances(self, ddof=1):
+        """Group variances (sample variance by default), NaN where a group has too few values."""
+        n = self.count[:len(self.groups)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self._frame(np.where(n > ddof, self.m2[:len(self.groups)] / (n - ddof), np.nan))
+
+    def confidence_intervals(self, level=0.95):
+        """
+        Confidence intervals of the group means.
+
+        Student's t intervals if scipy is installed, normal approximation otherwise.
+
+        :return: (lower, upper) DataFrames laid out like means().
+        """
+        n = self.count[:len(self.groups)]
+        if student_t is not None:
+            with np.errstate(invalid='ignore'):
+                quantile = student_t.ppf(0.5 + level / 2, np.maximum(n - 1, 1))
+        else:
+            quantile = NormalDist().inv_cdf(0.5 + level / 2)
+        means = self.means()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            half_width = quantile * np.sqrt(self.variances().to_numpy() / n)
+        return means - half_width, means + half_width
+
+
+class ReplicateAggregator:
+    """
+    Averages of the run output files, updated as replicates complete.
+
+    Keeps RunningStats by Agent ID (with class, trade behavior and active status, like the
+    run scripts) and by Agent Class, so the *_id_averages and *_class_averages files can
+    be written at any time without keeping or re-reading the runs.
+    """
+
+    def __init__(self):
+        self.by_id = RunningStats(ID_KEYS)
+        self.by_class = RunningStats(CLASS_KEYS)
+        self.num_runs = 0
+
+    def update(self, rows):
+        """Add the agent rows of one run (see engine.runner.agent_rows)."""
+        self.by_id.update(rows)
+        # the class averages leave out the ID, behavior and active columns
+        self.by_class.update([{name: value for name, value in row.items() if name not in ID_ONLY_COLUMNS}
+                              for row in rows])
+        self.num_runs += 1
+
+    def write(self, id_average_output_file, class_average_output_file, level=None):
+        """
+        Write the averages of the runs added so far.
+
+        :param level: Also write lower/upper bounds of this confidence level (e.g. 0.95)
+            next to the averages, as '<column> lower' and '<column> upper' columns.
+        """
+        for stats, filename in ((self.by_id, id_average_output_file), (self.by_class, class_average_output_file)):
+            table = stats.means()
+            if level is not None:
+                lower, upper = stats.confidence_intervals(level)
+                table = pd.concat([table, lower.add_suffix(' lower'), upper.add_suffix(' upper')], axis=1)
+            table.to_csv(filename)
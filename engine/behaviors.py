@@ -0,0 +1,48 @@
+#trading behaviors, encoded as small integers so they fit in an agent array
+AGGRESSIVE = 0
+CONSERVATIVE = 1
+RANDOM = 2
+
+
+def trade_amount(code, num_goods, rng):
+    """Return how many goods an agent with the given behavior code offers in a trade (rng: random.Random)."""
+    if num_goods == 0:
+        return 0  # No goods to trade
+    if code == AGGRESSIVE:
+        # tries to trade all available goods
+        return min(num_goods, rng.randint(1, num_goods))
+    if code == CONSERVATIVE:
+        # trades only 1 or 2 goods at most
+        return min(num_goods, rng.randint(1, 2))
+    # trades a random number of goods from 1 to half of the goods it has
+    return min(num_goods, rng.randint(1, max(1, num_goods // 2)))
+
+
+def aggressive_trade(agent1, agent2):
+    """Aggressive trading behavior: tries to trade as much as possible."""
+    return trade_amount(AGGRESSIVE, len(agent1.goods_list), agent1.model.random)
+
+
+def conservative_trade(agent1, agent2):
+    """Conservative trading behavior: trades minimal amounts."""
+    return trade_amount(CONSERVATIVE, len(agent1.goods_list), agent1.model.random)
+
+
+def random_trade(agent1, agent2):
+    """Random trading behavior: trades a random number of goods."""
+    return trade_amount(RANDOM, len(agent1.goods_list), agent1.model.random)
+
+
+# index in this tuple == behavior code
+BEHAVIORS = (aggressive_trade, conservative_trade, random_trade)
+BEHAVIOR_NAMES = tuple(behavior.__name__ for behavior in BEHAVIORS)
+
+
+def behavior_code(behavior):
+    """
+    Return the code of a behavior function.
+
+    Matching is done by name so that the functions defined in the old model files
+    (e.g. a fixed_agent_behaviors dict saved from a TestModelINTEST run) are accepted too.
+    """
+    return BEHAVIOR_NAMES.index(behavior.__name__)
@@ -0,0 +1,272 @@
+"""
+Benchmark suite of the engine over the scenario families.
+
+Every case builds the model of one scenario family at one scale (total number of
+merchants) on one graph, the 11-node network of the scenario or a larger synthetic
+one of one of the topologies of engine.synthetic, and measures:
+
+- construction time and peak memory (tracemalloc, construction and the first step);
+- per-step time of the movement, node bucketing, pair selection and trade phases
+  (see engine.profiling), and steps per second, over a few steps;
+- a full run with run_model() up to the scenario's max_steps, at the scales of
+  full_run_agents only (larger runs take hours).
+
+Results are saved as JSON; compare them with an earlier file to spot regressions:
+
+    python -m engine.benchmark --scales 110 10000 --output bench.json
+    python -m engine.benchmark --output new.json --compare bench.json
+    python -m engine.benchmark --graphs small_world hub_and_spoke --synthetic-nodes 10000
+"""
+import argparse
+import datetime
+import gc
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+
+from .model import ArrayModel
+from .profiling import PhaseProfiler
+from .regions import REGIONS
+from .runner import run_model
+from .scenario import ROOT, load_scenario
+from .synthetic import TOPOLOGIES, synthetic_network
+
+# One scenario per family
+FAMILIES = {
+    'Price': 'Price/HistoricalData',
+    'TransactionCost': 'TransactionCost/Extremes',
+    'Customs': 'Customs/IncomingOutgoing',
+    'DaysDistanceCustoms': 'Days_customs_HistPrices',
+    'Networks': 'Networks/State_network',
+    'Protectionism': 'Protectionism',
+    'Imperialism': 'Imperialism/a_all_customs_Italy',
+}
+SCALES = (110, 10_000, 100_000)
+GRAPHS = ('scenario',) + TOPOLOGIES
+DEFAULT_GRAPHS = ('scenario', 'geometric')
+SYNTHETIC_NODES = 200
+
+
+def complete_graph(nodes, weight=0.0):
+    """Complete graph with one weight on every edge, in place of the all_0.csv networks."""
+    graph = nx.Graph()
+    for source, target in itertools.combinations(nodes, 2):
+        graph.add_edge(source, target, weight=weight)
+    return graph
+
+
+def make_case(family, num_agents, graph='scenario', seed=0, synthetic_nodes=SYNTHETIC_NODES, trading='sequential',
+              backend='numpy', workers=1):
+    """
+    Model factory of one benchmark case.
+
+    :param family: Key of FAMILIES.
+    :param num_agents: Merchants in total, spread evenly over the nodes the scenario
+        places merchants on (all nodes of a synthetic graph). Private or State agents
+        of the scenario come on top.
+    :param graph: 'scenario' for the scenario's networks (a zero-weight complete graph if
+        the file is not in the repository), or a topology of engine.synthetic for a
+        synthetic network of synthetic_nodes ports in len(REGIONS) regions, with the
+        customs graphs the scenario uses.
+    :param trading: Trade settlement of the model, see ArrayModel.
+    :param backend: Kernels of the model, see ArrayModel.
+    :param workers: Threads of the meeting phase with the 'jit' backend, see ArrayModel.
+    :return: (make_model, max_steps) as for run_model().
+    """
+    scenario = load_scenario(FAMILIES[family])
+    kwargs = scenario.model_kwargs()
+    kwargs['trading'] = trading
+    kwargs['backend'] = backend
+    kwargs['workers'] = workers
+    if graph in TOPOLOGIES:
+        network = synthetic_network(graph, synthetic_nodes, seed=seed)
+        G = network.G
+        incoming = network.incoming if 'incoming' in scenario['customs_networks'] else None
+        outgoing = network.outgoing if 'outgoing' in scenario['customs_networks'] else None
+        nodes = list(G.nodes)
+        kwargs['node_classes'] = network.node_classes
+    else:
+        if os.path.exists(os.path.join(ROOT, scenario['network'])):
+            G, incoming, outgoing = scenario.load_networks()
+        else:
+            G, incoming, outgoing = complete_graph([float(node) for node in range(len(REGIONS))]), None, None
+        nodes = list(scenario.agents_per_node())
+    per_node, remainder = divmod(num_agents, len(nodes))
+    agents_per_node = {node: per_node + (n < remainder) for n, node in enumerate(nodes)}
+
+    def make_model(agent_behaviors=None, seed=None):
+        return ArrayModel(G, agents_per_node, incoming, outgoing, agent_behaviors=agent_behaviors, seed=seed,
+                          **kwargs)
+    return make_model, scenario['max_steps']
+
+
+def time_phases(model, steps):
+    """
+    Step the model with a PhaseProfiler attached.
+
+    :return: Dictionary of mean seconds per step of every phase (movement, bucketing,
+        pairing, trade), steps_per_sec and steps run.
+    """
+    profiler = PhaseProfiler()
+    profiler.attach(model)
+    start = time.perf_counter()
+    for _ in range(steps):
+        model.step()
+    elapsed = time.perf_counter() - start
+    result = {f'{phase}_sec_per_step': total / steps for phase, total in profiler.totals().items()}
+    result['steps_per_sec'] = steps / elapsed
+    result['steps'] = steps
+    return result
+
+
+def peak_memory(make_model, seed=0):
+    """Peak traced memory (bytes) of building a model and running its first step."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        model = make_model(seed=seed)
+        model.step()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def steps_for(num_agents):
+    """Timed steps of a case, fewer for larger models."""
+    return int(np.clip(200_000 // num_agents, 2, 200))
+
+
+def run_case(family, num_agents, graph='scenario', steps=None, full_run=False, seed=0,
+             synthetic_nodes=SYNTHETIC_NODES, trading='sequential', backend='numpy', workers=1):
+    """Benchmark one case, return its results as a dict."""
+    make_model, max_steps = make_case(family, num_agents, graph, seed, synthetic_nodes, trading, backend, workers)
+    if backend == 'jit':
+        make_model(seed=seed).step()  # compile (or load) the kernels outside the timings
+    start = time.perf_counter()
+    model = make_model(seed=seed)
+    result = {
+        'family': family,
+        'scenario': FAMILIES[family],
+        'graph': graph,
+        'trading': trading,
+        'backend': backend,
+        'workers': workers,
+        'scale': num_agents,
+        'agents': model.num_agents,
+        'nodes': len(model.nodes),
+        'construction_sec': time.perf_counter() - start,
+    }
+    result.update(time_phases(model, steps or steps_for(num_agents)))
+    result['peak_memory_bytes'] = peak_memory(make_model, seed)
+    if full_run:
+        start = time.perf_counter()
+        rows = run_model(make_model, 1, max_steps=max_steps, seed=seed)
+        elapsed = time.perf_counter() - start
+        result['full_run_sec'] = elapsed
+        result['full_run_steps'] = rows[0]['Step Count']
+        result['full_run_steps_per_sec'] = rows[0]['Step Count'] / elapsed
+    return result
+
+
+def environment():
+    """Machine and versions the results were measured with."""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': revision,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_suite(families=tuple(FAMILIES), scales=SCALES, graphs=DEFAULT_GRAPHS, steps=None, full_run_agents=(110,),
+              seed=0, synthetic_nodes=SYNTHETIC_NODES, trading='sequential', backend='numpy', workers=1):
+    """Benchmark every (family, scale, graph) case, printing a line per case."""
+    cases = []
+    for family, num_agents, graph in itertools.product(families, scales, graphs):
+        case = run_case(family, num_agents, graph, steps, num_agents in full_run_agents, seed, synthetic_nodes,
+                        trading, backend, workers)
+        cases.append(case)
+        print(f"{family:20s} {graph:13s} {case['nodes']:6d} nodes {case['agents']:7d} agents: {case['steps_per_sec']:9.2f} steps/s, "
+              f"move {case['movement_sec_per_step'] * 1e3:8.2f} ms, bucket {case['bucketing_sec_per_step'] * 1e3:7.2f} ms, "
+              f"pair {case['pairing_sec_per_step'] * 1e3:8.2f} ms, "
+              f"trade {case['trade_sec_per_step'] * 1e3:8.2f} ms, {case['peak_memory_bytes'] / 2**20:7.1f} MiB" +
+              (f", full run {case['full_run_steps']} steps at {case['full_run_steps_per_sec']:.2f} steps/s"
+               if 'full_run_sec' in case else ''))
+    return {'environment': environment(), 'cases': cases}
+
+
+def case_key(case):
+    return (case['family'], case['graph'], case['nodes'], case['scale'], case.get('trading', 'sequential'),
+            case.get('backend', 'numpy'), case.get('workers', 1))
+
+
+def compare(baseline, results, tolerance=0.1):
+    """
+    Compare the steps per second of two result files case by case.
+
+    :param tolerance: Relative slowdown reported as a regression.
+    :return: List of (case key, baseline steps/s, new steps/s) of the regressions.
+    """
+    before = {case_key(case): case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        old = before.get(case_key(case))
+        if old is None:
+            continue
+        ratio = case['steps_per_sec'] / old['steps_per_sec']
+        flag = 'REGRESSION' if ratio < 1 - tolerance else ''
+        print(f"{' '.join(map(str, case_key(case))):45s} {old['steps_per_sec']:9.2f} -> "
+              f"{case['steps_per_sec']:9.2f} steps/s ({ratio:5.2f}x) {flag}")
+        if flag:
+            regressions.append((case_key(case), old['steps_per_sec'], case['steps_per_sec']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the engine over the scenario families.")
+    parser.add_argument('--families', nargs='+', default=list(FAMILIES), choices=list(FAMILIES))
+    parser.add_argument('--scales', nargs='+', type=int, default=list(SCALES), help="total merchants per case")
+    parser.add_argument('--graphs', nargs='+', default=list(DEFAULT_GRAPHS), choices=list(GRAPHS))
+    parser.add_argument('--synthetic-nodes', type=int, default=SYNTHETIC_NODES, help="ports of the synthetic graphs")
+    parser.add_argument('--steps', type=int, help="timed steps per case (default: fewer for larger models)")
+    parser.add_argument('--full-run-agents', nargs='*', type=int, default=[110],
+                        help="scales that also get a full run (default: 110)")
+    parser.add_argument('--trading', default='sequential', choices=ArrayModel.TRADINGS)
+    parser.add_argument('--backend', default='numpy', choices=ArrayModel.BACKENDS)
+    parser.add_argument('--workers', type=int, default=1, help="threads of the meeting phase (backend jit)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="JSON file to save the results to")
+    parser.add_argument('--compare', help="earlier results to compare with; exits with 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="relative slowdown that is a regression")
+    args = parser.parse_args(argv)
+    results = run_suite(args.families, args.scales, args.graphs, args.steps, args.full_run_agents, args.seed,
+                        args.synthetic_nodes, args.trading, args.backend, args.workers)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4)
+        print(f"Results saved to: {args.output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
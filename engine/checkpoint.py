@@ -0,0 +1,140 @@
+import json
+import os
+import warnings
+
+import numpy as np
+
+# Agent arrays that change during a run; the others (ids, classes, behaviors, customs
+# factors) are rebuilt by the model constructor from the same arguments.
+STATE_ARRAYS = ('pos', 'wealth', 'active', 'has_traded', 'last_incoming', 'last_outgoing', 'last_transport')
+SEED_FILE = 'seed.json'
+# prefix of the saved state of the run's convergence detector
+CONVERGENCE_PREFIX = 'convergence.'
+
+
+def model_state(model):
+    """
+    Everything a model needs to continue a run: the changing agent arrays, the goods,
+    the movement history, the step counter and the state of the random streams.
+
+    :return: Dictionary of arrays, as saved by save_checkpoint().
+    """
+    state = {name: getattr(model, name) for name in STATE_ARRAYS}
+    state['unique_id'] = model.unique_id
+    state['counts'] = model.inventory.counts
+    state['sizes'] = model.inventory.sizes
+    if model.history is not None:
+        state['history_steps'], state['history_codes'] = model.history.codes()
+    state['steps'] = np.array(model.steps)
+    state['current_id'] = np.array(model.current_id)
+    state['replicate_steps'] = model.replicate_steps
+    rng_state = {'rng': model.rng.bit_generator.state, 'random': model.random.getstate(),
+                 'workers': [rng.bit_generator.state for rng in model.worker_rngs]}
+    state['rng_state'] = np.array(json.dumps(rng_state))
+    return state
+
+
+def set_model_state(model, state):
+    """Put a state from model_state() into a model built with the same arguments."""
+    if not np.array_equal(state['unique_id'], model.unique_id):
+        raise ValueError("The checkpoint belongs to a model with other agents")
+    for name in STATE_ARRAYS:
+        getattr(model, name)[:] = state[name]
+    model.num_active = int(np.count_nonzero(model.active))
+    model.inventory.counts[:] = state['counts']
+    model.inventory.sizes[:] = state['sizes']
+    if model.history is not None and 'history_codes' in state:
+        model.history.load(state['history_steps'], state['history_codes'])
+    model.steps = int(state['steps'])
+    model.current_id = int(state['current_id'])
+    if 'replicate_steps' in state:
+        model.replicate_steps[:] = state['replicate_steps']
+    rng_state = json.loads(str(state['rng_state']))
+    model.rng.bit_generator.state = rng_state['rng']
+    version, internal_state, gauss_next = rng_state['random']
+    model.random.setstate((version, tuple(internal_state), gauss_next))
+    for rng, worker_state in zip(model.worker_rngs, rng_state.get('workers', [])):
+        rng.bit_generator.state = worker_state
+
+
+def save_checkpoint(model, path, complete=False, max_steps=None, convergence=None, converged=False):
+    """
+    Save the state of a model to an .npz file.
+
+    The file is written next to path and renamed over it, so a run killed while saving
+    leaves the previous checkpoint intact.
+
+    :param complete: Mark the run as finished, resuming it only returns its final state
+        (unless it is resumed with a larger max_steps, see load_checkpoint()).
+    :param max_steps: Step limit of the run.
+    :param convergence: engine.convergence.ConvergenceDetector of the run, its state is
+        saved with the model's.
+    :param converged: The run ended because the detector reported a steady state.
+    """
+    state = model_state(model)
+    state['max_steps'] = np.array(-1 if max_steps is None else max_steps)
+    state['converged'] = np.array(converged)
+    state['convergence'] = np.array(convergence is not None)
+    if convergence is not None:
+        state.update({CONVERGENCE_PREFIX + name: value for name, value in convergence.state().items()})
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, complete=np.array(complete), **state)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(model, path, max_steps=None, convergence=None):
+    """
+    Restore a model, and the state of its convergence detector, from a checkpoint file.
+
+    :param max_steps: Step limit of the resumed run. A run marked finished at a smaller
+        step limit, which neither converged nor ran out of active agents, is not
+        finished and continues up to it.
+    :param convergence: engine.convergence.ConvergenceDetector of the resumed run, after
+        reset(). Without a saved detector state it warns and starts over from the
+        checkpoint's step, so the run may converge later than an uninterrupted one.
+    :return: True if the checkpoint marks a finished run.
+    """
+    with np.load(path) as data:
+        state = {name: data[name] for name in data.files}
+    set_model_state(model, state)
+    if convergence is not None:
+        if 'convergence' in state and state['convergence']:
+            convergence.set_state({name[len(CONVERGENCE_PREFIX):]: value for name, value in state.items()
+                                   if name.startswith(CONVERGENCE_PREFIX)})
+        else:
+            warnings.warn(f"{path} holds no convergence state, convergence detection restarts at step "
+                          f"{model.steps}", RuntimeWarning, stacklevel=2)
+    complete = bool(state['complete'])
+    if complete and max_steps is not None and 'max_steps' in state:
+        # checkpoints from before max_steps was saved count as finished
+        saved_max_steps = int(state['max_steps'])
+        if 0 <= saved_max_steps < max_steps and not state['converged'] and model.num_active:
+            complete = False
+    return complete
+
+
+def checkpoint_file(checkpoint_dir, run_number):
+    return os.path.join(checkpoint_dir, f'run_{run_number}.npz')
+
+
+def checkpoint_seed(checkpoint_dir, seed=None):
+    """
+    Master seed of the batch checkpointed in checkpoint_dir.
+
+    A resumed batch has to use the seed the checkpoints were made with, so it is saved
+    with them: the saved seed is returned if there is one (seed must then be None or
+    equal to it), otherwise seed (fresh entropy if None) is saved and returned.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    filename = os.path.join(checkpoint_dir, SEED_FILE)
+    if os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as file:
+            saved = json.load(file)['seed']
+        if seed is not None and seed != saved:
+            raise ValueError(f"The checkpoints in {checkpoint_dir} were made with seed {saved}, not {seed}")
+        return saved
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump({'seed': seed}, file)
+    return seed
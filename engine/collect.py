@@ -0,0 +1,190 @@
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed to write the series to Parquet
+    pa = None
+
+MODEL_REPORTERS = {
+    'Active Agents': lambda model: model.num_active,
+    'Total Wealth': lambda model: model.wealth.sum(),
+    'Moves': lambda model: model.step_moves,
+    'Goods Sold': lambda model: model.step_sales,
+}
+AGENT_REPORTERS = {
+    'Wealth': 'wealth',
+    'Active': 'active',
+    'Goods': lambda model: model.inventory.sizes,
+    'Node': lambda model: model.pos,
+}
+
+
+class DataCollector:
+    """
+    Per-step time series of a run, model-level and agent-level, like mesa's DataCollector.
+
+    Reporters are callables of the model, or names of model attributes. A model reporter
+    returns one value per step, an agent reporter one value per agent row (an array such
+    as model.wealth). Every `interval` steps collect() copies the values into preallocated
+    NumPy buffers of `capacity` samples; the buffers double when full, or, with a path,
+    are written to Parquet part files and reused, so a run of any length keeps at most
+    capacity samples in memory.
+
+    With a path, every flush() writes a part of its own, model/part-<first step>.parquet
+    and agents/part-<first step>.parquet, and run_model() flushes before it saves a
+    checkpoint. A run resumed from its checkpoint calls resume(), which keeps the parts
+    up to the checkpoint and drops those a killed run wrote after it.
+
+        collector = DataCollector(interval=10)
+        run_model(make_model, 1, collector=collector)
+        collector.agent_array('Wealth')     # samples x agents
+    """
+
+    def __init__(self, model_reporters=None, agent_reporters=None, interval=1, capacity=1024, path=None):
+        """
+        :param model_reporters: Dictionary of model reporters by column name, MODEL_REPORTERS by default.
+        :param agent_reporters: Dictionary of agent reporters by column name, AGENT_REPORTERS by default.
+        :param interval: Record every interval steps (step 0, interval, 2 * interval, ...)
+            and the last step.
+        :param capacity: Samples held in memory before the buffers grow or are written.
+        :param path: Directory to write the model and agents parts to (needs pyarrow),
+            in chunks of capacity samples. Kept in memory if None.
+        """
+        self.model_reporters = dict(MODEL_REPORTERS if model_reporters is None else model_reporters)
+        self.agent_reporters = dict(AGENT_REPORTERS if agent_reporters is None else agent_reporters)
+        self.interval = interval
+        self.capacity = capacity
+        self.path = path
+        if path is not None:
+            if pa is None:
+                raise ImportError("Writing the series to Parquet needs pyarrow (pip install pyarrow)")
+            os.makedirs(path, exist_ok=True)
+        self.steps = None
+        self.model_buffers = None
+        self.agent_buffers = None
+        self.unique_id = None
+        self.size = 0        # samples in the buffers
+        self.last_step = None
+
+    @staticmethod
+    def _report(model, reporter):
+        return getattr(model, reporter) if isinstance(reporter, str) else reporter(model)
+
+    def _allocate(self, model, model_values, agent_values):
+        if self.path is not None and self.last_step is None:
+            # a new run replaces the series of an earlier one
+            self._drop_parts(after=-1)
+        self.unique_id = model.unique_id.copy()
+        self.steps = np.empty(self.capacity, dtype=np.int64)
+        self.model_buffers = {name: np.empty(self.capacity, dtype=np.asarray(value).dtype)
+                              for name, value in model_values.items()}
+        self.agent_buffers = {name: np.empty((self.capacity, model.num_agents), dtype=np.asarray(value).dtype)
+                              for name, value in agent_values.items()}
+
+    def _grow(self):
+        self.capacity *= 2
+        for buffers in (self.model_buffers, self.agent_buffers):
+            for name, buffer in buffers.items():
+                grown = np.empty((self.capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+                grown[:self.size] = buffer[:self.size]
+                buffers[name] = grown
+        grown = np.empty(self.capacity, dtype=np.int64)
+        grown[:self.size] = self.steps[:self.size]
+        self.steps = grown
+
+    def collect(self, model, force=False):
+        """Record the model if its step is on the interval (or force), once per step."""
+        step = model.steps
+        if step == self.last_step or not (force or step % self.interval == 0):
+            return
+        model_values = {name: self._report(model, reporter) for name, reporter in self.model_reporters.items()}
+        agent_values = {name: self._report(model, reporter) for name, reporter in self.agent_reporters.items()}
+        if self.steps is None:
+            self._allocate(model, model_values, agent_values)
+        if self.size == self.capacity:
+            if self.path is None:
+                self._grow()
+            else:
+                self.flush()
+        self.steps[self.size] = step
+        for name, value in model_values.items():
+            self.model_buffers[name][self.size] = value
+        for name, value in agent_values.items():
+            self.agent_buffers[name][self.size] = value
+        self.size += 1
+        self.last_step = step
+
+    def resume(self, model):
+        """
+        Continue the series of a run resumed from its checkpoint at model.steps: the
+        parts written up to that step stay, the later ones are dropped. In memory, the
+        series starts over at the checkpoint.
+        """
+        if self.path is not None:
+            self._drop_parts(after=model.steps)
+            self.unique_id = model.unique_id.copy()
+            self.last_step = model.steps
+
+    def finish(self, model):
+        """Record the last step of the run and write what is left in the buffers."""
+        self.collect(model, force=True)
+        self.flush()
+
+    def _tables(self):
+        steps = self.steps[:self.size]
+        model_table = {'Step': steps}
+        model_table.update({name: buffer[:self.size] for name, buffer in self.model_buffers.items()})
+        num_agents = len(self.unique_id)
+        agent_table = {'Step': np.repeat(steps, num_agents), 'Agent ID': np.tile(self.unique_id, len(steps))}
+        agent_table.update({name: buffer[:self.size].ravel() for name, buffer in self.agent_buffers.items()})
+        return model_table, agent_table
+
+    def _parts(self, name):
+        # zero-padded first steps, so the names sort in step order
+        return sorted(glob.glob(os.path.join(self.path, name, 'part-*.parquet')))
+
+    def _drop_parts(self, after):
+        for name in ('model', 'agents'):
+            for part in self._parts(name):
+                if int(os.path.basename(part)[5:-8]) > after:
+                    os.remove(part)
+
+    def _read(self, name, columns=None):
+        return pa.concat_tables([pq.read_table(part, columns=columns) for part in self._parts(name)])
+
+    def flush(self):
+        """Write the samples in the buffers to a new part of the Parquet files and empty the buffers."""
+        if self.path is None or not self.size:
+            return
+        for name, columns in zip(('model', 'agents'), self._tables()):
+            directory = os.path.join(self.path, name)
+            os.makedirs(directory, exist_ok=True)
+            part = os.path.join(directory, f'part-{self.steps[0]:010d}.parquet')
+            # written to a temporary file and renamed, so a killed run leaves no broken part
+            pq.write_table(pa.table(columns), part + '.tmp')
+            os.replace(part + '.tmp', part)
+        self.size = 0
+
+    def model_vars(self):
+        """Model reporters as a DataFrame, one row per recorded step."""
+        if self.path is not None:
+            return self._read('model').to_pandas()
+        return pd.DataFrame(self._tables()[0]) if self.steps is not None else pd.DataFrame()
+
+    def agent_vars(self):
+        """Agent reporters as a long DataFrame, one row per recorded step and agent."""
+        if self.path is not None:
+            return self._read('agents').to_pandas()
+        return pd.DataFrame(self._tables()[1]) if self.steps is not None else pd.DataFrame()
+
+    def agent_array(self, name):
+        """One agent reporter as a (recorded steps x agents) array, from memory or file."""
+        if self.path is None:
+            return self.agent_buffers[name][:self.size].copy()
+        data = self._read('agents', columns=[name]).column(name)
+        return data.to_numpy().reshape(-1, len(self.unique_id))
@@ -0,0 +1,151 @@
+"""
+Paired comparisons of scenarios under common random numbers.
+
+Run r of every scenario gets the same seed, and agents the scenarios share get the same
+trade behaviors. The models restart their random streams at every phase of every step
+(ArrayModel's common_random_numbers), so the scenarios draw the same numbers for
+movement, meetings and trades step by step. A difference between the runs then comes
+from the settings rather than from different draws. Paired differences have a much
+smaller variance than differences of independent runs, so fewer runs show them.
+
+    python -m engine.compare Protectionism Historical_Protectionism --runs 20 --seed 1
+
+prints the mean difference of every scenario to the first one, by agent class, with
+its confidence interval and the standard error independent runs would have had.
+"""
+import argparse
+import functools
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import CLASS_KEYS, ID_KEYS, SKIPPED_COLUMNS, RunningStats
+from .log import LEVELS, SUMMARY, configure, logger
+from .rng import run_seed_sequence
+from .runner import draw_behaviors, run_replicates
+from .scenario import load_scenario
+
+# outputs compared by default
+COLUMNS = ['Total Wealth']
+
+
+def shared_behaviors(make_models, seed, first_run=1):
+    """
+    Trade behaviors of every scenario for paired runs: an agent takes the behavior the
+    first scenario having its Agent ID drew, agents of one scenario only their own.
+
+    :param make_models: Model factories of the scenarios.
+    :param seed: Master seed, the behaviors are drawn from the stream of first_run.
+    :return: List of behavior dicts, one per scenario.
+    """
+    shared, result = {}, []
+    for make_model in make_models:
+        own = draw_behaviors(make_model, run_seed_sequence(seed, first_run))
+        for agent_id, behavior in own.items():
+            shared.setdefault(agent_id, behavior)
+        result.append({agent_id: shared[agent_id] for agent_id in own})
+    return result
+
+
+def class_means(rows):
+    """Class averages of the numeric outputs of one run, indexed by Agent Class."""
+    frame = pd.DataFrame(rows).drop(columns=[name for name in ID_KEYS + SKIPPED_COLUMNS
+                                             if name not in CLASS_KEYS], errors='ignore')
+    return frame.groupby(CLASS_KEYS[0]).mean()
+
+
+def run_paired(scenarios, num_runs, seed=None, processes=None, max_steps=None, common_random_numbers=True,
+               batch_size=None, log_level=None):
+    """
+    Run num_runs replicates of every scenario, run r of all scenarios paired.
+
+    :param scenarios: Scenarios (see engine.scenario.Scenario).
+    :param seed: Master seed shared by the scenarios, fresh entropy if None.
+    :param processes: Worker processes of every scenario's runs, see run_replicates().
+    :param max_steps: Step limit of every run, each scenario's max_steps by default.
+    :param common_random_numbers: Pair the random streams as well as the seeds and the
+        behaviors. False gives paired seeds only, for comparison.
+    :param batch_size: Simulate the runs in batches, see run_replicates().
+    :param log_level: engine.log level of the worker processes, see run_replicates().
+        Every completed run is logged at the SUMMARY level.
+    :return: DataFrame of the class averages of every run, indexed by (Scenario, Run,
+        Agent Class); goods a run does not hold count 0.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    make_models = [functools.partial(scenario.model_factory(), common_random_numbers=common_random_numbers)
+                   for scenario in scenarios]
+    tables = {}
+    for scenario, make_model, behaviors in zip(scenarios, make_models, shared_behaviors(make_models, seed)):
+        runs = run_replicates(make_model, num_runs, behaviors, processes=processes, seed=seed,
+                              max_steps=max_steps or scenario['max_steps'], batch_size=batch_size,
+                              log_level=log_level)
+        for run, rows in runs:
+            tables[scenario.name, run] = class_means(rows)
+            logger.log(SUMMARY, "%s run %d completed.", scenario.name, run)
+    table = pd.concat(tables, names=['Scenario', 'Run'])
+    return table.fillna(0).sort_index()
+
+
+def paired_differences(table, baseline, columns=COLUMNS, level=0.95):
+    """
+    Mean differences of every scenario to a baseline over the paired runs.
+
+    :param table: Class averages per run, as returned by run_paired().
+    :param baseline: Name of the scenario the others are compared to.
+    :param columns: Outputs to compare.
+    :param level: Confidence level of the intervals.
+    :return: DataFrame indexed by (Scenario, Agent Class) of every column's mean
+        difference, its lower and upper bounds, its standard error, and the standard
+        error of the difference of the means of unpaired runs.
+    """
+    base = table.xs(baseline, level='Scenario')[columns]
+    results = []
+    for name in table.index.unique('Scenario'):
+        if name == baseline:
+            continue
+        other = table.xs(name, level='Scenario')[columns]
+        difference = (other - base).dropna()
+        stats = RunningStats(CLASS_KEYS)
+        stats.update(difference.reset_index().drop(columns='Run').to_dict('records'))
+        lower, upper = stats.confidence_intervals(level)
+        n = stats.counts()
+        # variance of a difference of means of as many independent runs
+        unpaired = base.groupby(CLASS_KEYS[0]).var() + other.groupby(CLASS_KEYS[0]).var()
+        result = pd.concat([stats.means(), lower.add_suffix(' lower'), upper.add_suffix(' upper'),
+                            np.sqrt(stats.variances() / n).add_suffix(' se'),
+                            np.sqrt(unpaired / n).add_suffix(' unpaired se')], axis=1)
+        results.append(pd.concat({name: result}, names=['Scenario']))
+    return pd.concat(results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare scenarios over paired runs under common random numbers.")
+    parser.add_argument('scenarios', nargs='+', help="scenario directories, the first is the baseline")
+    parser.add_argument('--runs', type=int, default=20, help="paired runs (default: 20)")
+    parser.add_argument('--processes', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, help="master seed (default: fresh entropy)")
+    parser.add_argument('--max-steps', type=int, help="step limit of every run (default: each scenario's)")
+    parser.add_argument('--batch-size', type=int, help="simulate the runs in batches, see engine.scenario")
+    parser.add_argument('--columns', nargs='+', default=COLUMNS, help="outputs to compare (default: Total Wealth)")
+    parser.add_argument('--independent', action='store_true',
+                        help="pair only the seeds and behaviors, not the random streams")
+    parser.add_argument('--output', help="CSV file to save the class averages of every run to")
+    parser.add_argument('--log-level', choices=list(LEVELS), default='summary',
+                        help="engine log level (default: summary, one line per run)")
+    args = parser.parse_args(argv)
+    if len(args.scenarios) < 2:
+        parser.error("expected at least two scenarios")
+    configure(args.log_level)
+    scenarios = [load_scenario(name) for name in args.scenarios]
+    table = run_paired(scenarios, args.runs, args.seed, args.processes, args.max_steps, not args.independent,
+                       args.batch_size, args.log_level)
+    if args.output:
+        table.to_csv(args.output)
+        print(f"Class averages saved to: {args.output}")
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(paired_differences(table, scenarios[0].name, args.columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class ConvergenceDetector:
+    """
+    Decides when a run has reached a steady state and can stop before max_steps.
+
+    run_model() calls reset() with the fresh (or resumed) model and converged() after
+    every step; the run ends at the first step converged() returns True. One detector
+    serves every run of a batch, reset() clears what it kept of the previous run.
+    state() and set_state() save and restore what it kept with the run's checkpoints
+    (see engine.checkpoint), so a resumed run converges at the same step.
+    """
+
+    def reset(self, model):
+        pass
+
+    def converged(self, model):
+        raise NotImplementedError
+
+    def state(self):
+        """What the detector kept of the run so far, as a dictionary of arrays."""
+        return {}
+
+    def set_state(self, state):
+        """Restore a state() after reset()."""
+
+
+class Quiescence(ConvergenceDetector):
+    """Converged after `steps` consecutive steps without a move or a sale."""
+
+    def __init__(self, steps=10):
+        self.steps = steps
+        self.quiet = 0
+
+    def reset(self, model):
+        self.quiet = 0
+
+    def converged(self, model):
+        self.quiet = 0 if model.step_moves or model.step_sales else self.quiet + 1
+        return self.quiet >= self.steps
+
+    def state(self):
+        return {'quiet': np.array(self.quiet)}
+
+    def set_state(self, state):
+        self.quiet = int(state['quiet'])
+
+
+class DistributionChange(ConvergenceDetector):
+    """
+    Converged when the wealth and goods distributions changed by less than epsilon over
+    the last `window` steps.
+
+    Every `window` steps the sorted wealth of all agents and the units of every good
+    held by every agent class are compared with the previous snapshot; the change is
+    the L1 distance relative to the L1 norm of the previous snapshot, for wealth and
+    goods separately. Agents are compared as a distribution, not one by one, so merchants
+    swapping places in it do not count as a change.
+    """
+
+    def __init__(self, epsilon=1e-3, window=50):
+        self.epsilon = epsilon
+        self.window = window
+        self.previous = None
+
+    def reset(self, model):
+        self.previous = None
+
+    def snapshot(self, model):
+        wealth = np.sort(model.wealth)
+        goods = np.zeros((int(model.region.max()) + 1, model.inventory.counts.shape[1]))
+        np.add.at(goods, model.region, model.inventory.counts)
+        return wealth, goods
+
+    def converged(self, model):
+        if model.steps % self.window:
+            return False
+        current = self.snapshot(model)
+        previous, self.previous = self.previous, current
+        if previous is None:
+            return False
+        for old, new in zip(previous, current):
+            scale = np.abs(old).sum()
+            if np.abs(new - old).sum() > self.epsilon * scale:
+                return False
+        return True
+
+    def state(self):
+        if self.previous is None:
+            return {}
+        wealth, goods = self.previous
+        return {'wealth': wealth, 'goods': goods}
+
+    def set_state(self, state):
+        self.previous = (state['wealth'], state['goods']) if 'wealth' in state else None
+
+
+class AnyOf(ConvergenceDetector):
+    """Converged as soon as one of the given detectors is."""
+
+    def __init__(self, *detectors):
+        self.detectors = detectors
+
+    def reset(self, model):
+        for detector in self.detectors:
+            detector.reset(model)
+
+    def converged(self, model):
+        # every detector sees every step, so stateful ones keep counting
+        return any([detector.converged(model) for detector in self.detectors])
+
+    def state(self):
+        return {f'{i}.{name}': value for i, detector in enumerate(self.detectors)
+                for name, value in detector.state().items()}
+
+    def set_state(self, state):
+        for i, detector in enumerate(self.detectors):
+            prefix = f'{i}.'
+            detector.set_state({name[len(prefix):]: value for name, value in state.items() if name.startswith(prefix)})
+
+
+DETECTORS = {'quiescence': Quiescence, 'distribution': DistributionChange}
+
+
+def make_detector(spec):
+    """
+    Build a detector from its settings, e.g. {'type': 'quiescence', 'steps': 10}, or a
+    list of them for AnyOf. None gives None (runs end only when no agent is active).
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, list):
+        return AnyOf(*(make_detector(item) for item in spec))
+    settings = dict(spec)
+    kind = settings.pop('type')
+    if kind not in DETECTORS:
+        raise ValueError(f"Unknown convergence detector {kind!r}, expected one of {tuple(DETECTORS)}")
+    return DETECTORS[kind](**settings)
@@ -0,0 +1,129 @@
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for the Parquet export
+    pa = None
+
+
+def code_dtype(num_nodes):
+    """Smallest unsigned integer type holding the node codes and the no-move code."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if num_nodes < np.iinfo(dtype).max:
+            return dtype
+    raise ValueError(f"Too many nodes: {num_nodes}")
+
+
+class MovementHistory:
+    """
+    Nodes visited by every agent, as small integer node codes.
+
+    The old agents appended every node they moved to to a list of floats. Here every step
+    with moves is one row of (agents,) node codes, uint8 for up to 254 nodes and uint16
+    beyond, and the largest code of the type (no_move) for agents that did not move in
+    that step: one or two bytes per agent and step instead of a boxed float.
+
+    Rows live in blocks of block_steps rows allocated as needed, or, with a length, in
+    one shared ring buffer keeping only the last `length` steps.
+    """
+
+    def __init__(self, num_agents, nodes, length=None, block_steps=64):
+        """
+        :param num_agents: Number of agent rows.
+        :param nodes: Node id of every node code (the CSR order of the network).
+        :param length: Keep only the rows of the last length steps, all if None.
+        :param block_steps: Rows per block of a full history.
+        """
+        self.nodes = np.asarray(nodes)
+        self.dtype = code_dtype(len(nodes))
+        self.no_move = np.iinfo(self.dtype).max
+        self.num_agents = num_agents
+        self.length = length
+        self.block_steps = length or block_steps
+        self.blocks = []
+        self.row_steps = np.zeros(self.block_steps, dtype=np.int64)
+        self.num_rows = 0  # rows recorded, including those a ring buffer dropped
+        self.current_step = None
+        self.current_row = None
+
+    def _open_row(self, step):
+        offset = self.num_rows % self.block_steps
+        if self.length is None:
+            if offset == 0:
+                self.blocks.append(np.empty((self.block_steps, self.num_agents), dtype=self.dtype))
+                if self.num_rows:
+                    self.row_steps = np.concatenate([self.row_steps, np.zeros(self.block_steps, dtype=np.int64)])
+            block = self.blocks[-1]
+            self.row_steps[self.num_rows] = step
+        else:
+            if not self.blocks:
+                self.blocks.append(np.empty((self.length, self.num_agents), dtype=self.dtype))
+            block = self.blocks[0]
+            self.row_steps[offset] = step
+        block[offset] = self.no_move
+        self.current_row = block[offset]
+        self.current_step = step
+        self.num_rows += 1
+
+    def record(self, step, agents, codes):
+        """Record that the given agent rows moved to the nodes of the given codes in step."""
+        if step != self.current_step:
+            self._open_row(step)
+        self.current_row[agents] = codes
+
+    def _ring_order(self):
+        kept = min(self.num_rows, self.length)
+        return np.arange(self.num_rows - kept, self.num_rows) % self.length
+
+    def codes(self):
+        """(steps, codes): the step of every row kept and the (rows x agents) node codes, oldest first."""
+        if not self.blocks:
+            return np.zeros(0, dtype=np.int64), np.empty((0, self.num_agents), dtype=self.dtype)
+        if self.length is None:
+            return self.row_steps[:self.num_rows].copy(), np.concatenate(self.blocks)[:self.num_rows]
+        order = self._ring_order()
+        return self.row_steps[order], self.blocks[0][order]
+
+    def agent(self, i):
+        """Node ids agent row i moved to, in order, like the old movement_history lists."""
+        if not self.blocks:
+            return []
+        if self.length is None:
+            column = np.concatenate([block[:, i] for block in self.blocks])[:self.num_rows]
+        else:
+            column = self.blocks[0][self._ring_order(), i]
+        return self.nodes[column[column != self.no_move]].tolist()
+
+    def load(self, steps, codes):
+        """Replace the history by the rows of codes() (restoring a checkpoint)."""
+        self.blocks = []
+        self.row_steps = np.zeros(self.block_steps, dtype=np.int64)
+        self.num_rows = 0
+        self.current_step = None
+        for step, row in zip(steps.tolist(), codes):
+            self._open_row(step)
+            self.current_row[:] = row
+
+    def moves(self):
+        """Every recorded move as (steps, agent rows, node ids) arrays, by step."""
+        steps, rows = self.codes()
+        step_index, agents = np.nonzero(rows != self.no_move)
+        return steps[step_index], agents, self.nodes[rows[step_index, agents]]
+
+    def write_parquet(self, path, unique_id):
+        """
+        Write the moves as a Parquet table with the columns Step, Agent ID and Node. Node
+        is dictionary-encoded, so the file stores small codes like the buffers.
+
+        :param unique_id: Agent ID of every agent row (model.unique_id).
+        """
+        if pa is None:
+            raise ImportError("The Parquet export needs pyarrow (pip install pyarrow)")
+        steps, agents, nodes = self.moves()
+        table = pa.table({
+            'Step': pa.array(steps, type=pa.int32()),
+            'Agent ID': pa.array(np.asarray(unique_id)[agents], type=pa.int64()),
+            'Node': pa.array(nodes).dictionary_encode(),
+        })
+        pq.write_table(table, path)
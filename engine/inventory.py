@@ -0,0 +1,71 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+import numpy as np
+
+
+class Inventory:
+    """
+    Goods of all agents as an (agents x good types) matrix of unit counts.
+
+    Replaces the per-agent goods_list of (name, quantity, price) tuples: every tuple of
+    the old lists had quantity 1 and the price of its good type, so an agent's list is
+    fully described by how many units of each good type it holds. Adding or removing a
+    unit is O(1), drawing units is O(good types) instead of O(inventory length).
+    """
+
+    def __init__(self, num_agents, names, prices):
+        """
+        :param num_agents: Number of agent rows.
+        :param names: Name of every good type.
+        :param prices: Price of every good type.
+        """
+        self.names = list(names)
+        self.index = {name: g for g, name in enumerate(self.names)}
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.counts = np.zeros((num_agents, len(self.names)), dtype=np.int32)
+        self.sizes = np.zeros(num_agents, dtype=np.int64)  # len(goods_list) of every agent
+
+    def add(self, agent, good, n=1):
+        """Give agent n units of good (a good index)."""
+        self.counts[agent, good] += n
+        self.sizes[agent] += n
+
+    def remove(self, agent, good):
+        """
+        Take one unit of good from agent.
+
+        Like the list version, removing a good the agent no longer holds does nothing.
+        That happens when the second half of a trade sells goods that were drawn before
+        the first half gave them away.
+        """
+        if self.counts[agent, good] > 0:
+            self.counts[agent, good] -= 1
+            self.sizes[agent] -= 1
+
+    def sample(self, agent, k, rng):
+        """Draw k of agent's units without replacement (rng: random.Random), return their good indices in draw order."""
+        positions = rng.sample(range(self.sizes[agent]), k)
+        # a row has one entry per good type, a plain list is faster than NumPy at that size
+        bounds = list(accumulate(self.counts[agent].tolist()))
+        return [bisect_right(bounds, position) for position in positions]
+
+    def goods_list(self, agent):
+        """Rebuild the old goods_list of one agent (units grouped by good type)."""
+        goods = []
+        for g in np.flatnonzero(self.counts[agent]):
+            goods.extend([(self.names[g], 1, self.prices[g].item())] * int(self.counts[agent, g]))
+        return goods
+
+    def value(self):
+        """Price of all goods held, per agent."""
+        return self.counts @ self.prices
+
+    def totals(self):
+        """Units of every good type held by all agents together, by name."""
+        return dict(zip(self.names, self.counts.sum(axis=0).tolist()))
+
+    def summary(self, agents=None):
+        """Units per good type as {name: counts per agent}, the columns of the run output files."""
+        counts = self.counts if agents is None else self.counts[agents]
+        return {name: counts[:, g] for g, name in enumerate(self.names)}
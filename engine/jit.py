@@ -0,0 +1,260 @@
+import numpy as np
+
+from .behaviors import AGGRESSIVE, CONSERVATIVE
+
+try:
+    import numba
+except ImportError:  # the JIT backend is optional, ArrayModel falls back to the NumPy kernels
+    numba = None
+
+
+def jit(function):
+    """
+    Compile a kernel with numba (nopython, GIL released, cached on disk) if numba is
+    installed, else return it unchanged. The plain function stays available as .py_func.
+    """
+    if numba is None:
+        function.py_func = function
+        return function
+    return numba.njit(cache=True, nogil=True)(function)
+
+
+def jit_available():
+    """Whether the JIT backend can be used (numba is installed)."""
+    return numba is not None
+
+
+# The kernels below are loops over the model arrays, one agent, pair or good at a time,
+# like the scalar methods of ArrayModel. They draw only through rng.random() of the
+# model's numpy Generator, which numba supports, so compiled and plain runs of a kernel
+# consume the same stream and give the same results.
+
+@jit
+def _floyd_sample(rng, n, k, out):
+    # k distinct integers of 0..n-1 (Floyd's algorithm, like movement.sample_edges)
+    for r in range(k):
+        upper = n - k + r
+        t = int(rng.random() * (upper + 1))
+        for s in range(r):
+            if out[s] == t:
+                t = upper
+                break
+        out[r] = t
+
+
+@jit
+def choose_moves_kernel(rng, indptr, weight, pos, wealth, extra_cost, scale, sample_size, edge, cost):
+    """Loop version of movement.choose_moves(), writing edge and cost per agent."""
+    chosen = np.empty(sample_size, dtype=np.int64)
+    for i in range(len(pos)):
+        start = indptr[pos[i]]
+        degree = indptr[pos[i] + 1] - start
+        if degree <= sample_size:
+            k = degree
+            for r in range(k):
+                chosen[r] = r
+        else:
+            k = sample_size
+            _floyd_sample(rng, degree, k, chosen)
+        best, best_cost, ties = -1, np.inf, 0
+        for r in range(k):
+            e = start + chosen[r]
+            c = weight[e] * scale[i] + extra_cost[i]
+            if c > wealth[i]:
+                continue
+            if c < best_cost:
+                best, best_cost, ties = e, c, 1
+            elif c == best_cost:
+                # uniform among the tied edges
+                ties += 1
+                if rng.random() * ties < 1:
+                    best = e
+        edge[i] = best
+        cost[i] = best_cost
+
+
+@jit
+def greedy_pairs_kernel(rng, order, bounds, type_id, costs, sample_size, first, second):
+    """
+    Loop version of meet_on_node() over every node: the pairs of a step, written to
+    first and second. Returns the number of pairs.
+    """
+    count = 0
+    for node in range(len(bounds) - 1):
+        n = bounds[node + 1] - bounds[node]
+        if n < 2:
+            continue
+        agents = order[bounds[node]:bounds[node + 1]].copy()
+        selected = np.empty(n, dtype=np.int64)
+        while n > 1:
+            if sample_size < 0 or n <= sample_size:
+                k = n
+                for x in range(k):
+                    selected[x] = x
+            else:
+                k = sample_size
+                _floyd_sample(rng, n, k, selected)
+                # Floyd's sample is a uniform set but not in uniform order; the order decides
+                # which agent of a pair sells first, so shuffle it like random.sample()
+                for x in range(k - 1, 0, -1):
+                    y = int(rng.random() * (x + 1))
+                    selected[x], selected[y] = selected[y], selected[x]
+            # uniform among the pairs of minimum transaction cost
+            best_p, best_q, min_cost, ties = -1, -1, np.inf, 0
+            for x in range(k):
+                for y in range(x + 1, k):
+                    p, q = selected[x], selected[y]
+                    c = costs[type_id[agents[p]], type_id[agents[q]]]
+                    if c < min_cost:
+                        best_p, best_q, min_cost, ties = p, q, c, 1
+                    elif c == min_cost:
+                        ties += 1
+                        if rng.random() * ties < 1:
+                            best_p, best_q = p, q
+            first[count] = agents[best_p]
+            second[count] = agents[best_q]
+            count += 1
+            # move the last agents into the slots of the pair, higher position first
+            agents[max(best_p, best_q)] = agents[n - 1]
+            agents[min(best_p, best_q)] = agents[n - 2]
+            n -= 2
+    return count
+
+
+@jit
+def shuffle_pairs_kernel(rng, order, bounds, active, type_id, first, second):
+    """Loop version of shuffle_on_node() over every node. Returns the number of pairs."""
+    count = 0
+    for node in range(len(bounds) - 1):
+        n = bounds[node + 1] - bounds[node]
+        if n < 2:
+            continue
+        agents = order[bounds[node]:bounds[node + 1]].copy()
+        for i in range(n - 1, 0, -1):
+            j = int(rng.random() * (i + 1))
+            agents[i], agents[j] = agents[j], agents[i]
+        for x in range(0, n - 1, 2):
+            a, b = agents[x], agents[x + 1]
+            if active[a] and active[b] and type_id[a] != type_id[b]:
+                first[count] = a
+                second[count] = b
+                count += 1
+    return count
+
+
+@jit
+def _trade_amount(rng, code, num_goods):
+    # behaviors.trade_amount()
+    if num_goods == 0:
+        return 0
+    if code == AGGRESSIVE:
+        upper = num_goods
+    elif code == CONSERVATIVE:
+        upper = 2
+    else:
+        upper = max(1, num_goods // 2)
+    return min(num_goods, 1 + int(rng.random() * upper))
+
+
+@jit
+def _draw_units(rng, counts, k, out, remaining):
+    # k units of a count row without replacement, their goods in draw order (Inventory.sample());
+    # remaining is scratch space of the row's length
+    remaining[:] = counts
+    total = remaining.sum()
+    for r in range(k):
+        position = int(rng.random() * total)
+        g = 0
+        while position >= remaining[g]:
+            position -= remaining[g]
+            g += 1
+        remaining[g] -= 1
+        total -= 1
+        out[r] = g
+
+
+@jit
+def _sell(rng, seller, buyer, goods, wealth, counts, sizes, prices, options, remaining):
+    # ArrayModel._sell()
+    sold = 0
+    for good in goods:
+        price = prices[good]
+        if wealth[buyer] < price or sizes[buyer] == 0:
+            continue
+        num_options = min(3, sizes[buyer])
+        _draw_units(rng, counts[buyer], num_options, options, remaining)
+        option = options[0]
+        for r in range(1, num_options):
+            if prices[options[r]] < prices[option]:
+                option = options[r]
+
+        wealth[buyer] -= price
+        wealth[seller] += price
+        if counts[seller, good] > 0:
+            counts[seller, good] -= 1
+            sizes[seller] -= 1
+        counts[buyer, good] += 1
+        counts[buyer, option] -= 1
+        counts[seller, option] += 1
+        sizes[seller] += 1
+        sold += 1
+    return sold
+
+
+@jit
+def settle_trades_kernel(rng, first, second, behavior, wealth, counts, sizes, prices, sold_first, sold_second):
+    """Loop version of trading.settle_trades(): ArrayModel.trade() for every pair, in order."""
+    # scratch buffers shared by all pairs; an agent offers at most the goods it holds,
+    # and a trade does not change the number of goods its agents hold before they are drawn
+    most = 0
+    for i in range(len(first)):
+        most = max(most, sizes[first[i]], sizes[second[i]])
+    goods_a = np.empty(most, dtype=np.int64)
+    goods_b = np.empty(most, dtype=np.int64)
+    options = np.empty(3, dtype=np.int64)
+    remaining = np.empty(counts.shape[1], dtype=counts.dtype)
+    for i in range(len(first)):
+        a, b = first[i], second[i]
+        amount_a = _trade_amount(rng, behavior[a], sizes[a])
+        amount_b = _trade_amount(rng, behavior[b], sizes[b])
+        _draw_units(rng, counts[a], amount_a, goods_a, remaining)
+        _draw_units(rng, counts[b], amount_b, goods_b, remaining)
+        sold_first[i] = _sell(rng, a, b, goods_a[:amount_a], wealth, counts, sizes, prices, options, remaining)
+        sold_second[i] = _sell(rng, b, a, goods_b[:amount_b], wealth, counts, sizes, prices, options, remaining)
+
+
+def choose_moves(rng, indptr, weight, pos, wealth, extra_cost=0, sample_size=5, scale=1):
+    """movement.choose_moves() on the JIT kernel, same arguments and results."""
+    n = len(pos)
+    edge = np.empty(n, dtype=np.int64)
+    cost = np.empty(n, dtype=np.float64)
+    choose_moves_kernel(rng, np.asarray(indptr), np.asarray(weight), pos, wealth,
+                        np.ascontiguousarray(np.broadcast_to(np.asarray(extra_cost, dtype=np.float64), n)),
+                        np.ascontiguousarray(np.broadcast_to(np.asarray(scale, dtype=np.float64), n)),
+                        sample_size, edge, cost)
+    return edge, cost
+
+
+def greedy_pairs(rng, order, bounds, type_id, costs, sample_size):
+    """Pairs (first, second) of the greedy meetings of all nodes, agents bucketed by agents_by_node()."""
+    first = np.empty(len(order) // 2, dtype=np.int64)
+    second = np.empty(len(order) // 2, dtype=np.int64)
+    count = greedy_pairs_kernel(rng, order, bounds, type_id, costs, -1 if sample_size is None else sample_size,
+                                first, second)
+    return first[:count], second[:count]
+
+
+def shuffle_pairs(rng, order, bounds, active, type_id):
+    """Pairs (first, second) of the shuffle meetings of all nodes."""
+    first = np.empty(len(order) // 2, dtype=np.int64)
+    second = np.empty(len(order) // 2, dtype=np.int64)
+    count = shuffle_pairs_kernel(rng, order, bounds, active, type_id, first, second)
+    return first[:count], second[:count]
+
+
+def settle_trades(rng, first, second, behavior, wealth, counts, sizes, prices):
+    """trading.settle_trades() on the JIT kernel, same arguments and results."""
+    sold_first = np.zeros(len(first), dtype=np.int64)
+    sold_second = np.zeros(len(first), dtype=np.int64)
+    settle_trades_kernel(rng, first, second, behavior, wealth, counts, sizes, prices, sold_first, sold_second)
+    return sold_first, sold_second
@@ -0,0 +1,104 @@
+import logging
+import sys
+
+import numpy as np
+
+# Log levels of the engine, from least to most detailed. Messages are passed with
+# %-style arguments and formatted only when their level is enabled, and the hot paths
+# check the level once per step, so a disabled level costs nothing per trade.
+SUMMARY = logging.INFO  # one line per run
+STEP = 15               # one line per step
+TRADE = 5               # nodes, pairs and trades
+OFF = logging.CRITICAL + 1
+
+LEVELS = {'off': OFF, 'summary': SUMMARY, 'step': STEP, 'trade': TRADE}
+logging.addLevelName(STEP, 'STEP')
+logging.addLevelName(TRADE, 'TRADE')
+
+logger = logging.getLogger('engine')
+
+
+def configure(level='summary', stream=None):
+    """
+    Send engine log messages of the given level and above to stream (stdout by default).
+
+    :param level: 'off', 'summary', 'step', 'trade' or a logging level number.
+    """
+    level = LEVELS[level] if isinstance(level, str) else level
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+TRADE_DTYPE = np.dtype([
+    ('step', '<u4'),
+    ('node', '<i4'),
+    ('agent1', '<i8'),
+    ('agent2', '<i8'),
+    ('sold1', '<u4'),     # goods agent1 handed over
+    ('sold2', '<u4'),     # goods agent2 handed over
+    ('wealth1', '<f8'),   # wealth after the trade
+    ('wealth2', '<f8'),
+])
+
+
+class TradeLog:
+    """
+    Binary per-trade log, for when the per-trade detail is needed at full speed.
+
+    Trades are collected in a fixed-size record buffer and written to the file as raw
+    TRADE_DTYPE records whenever it fills up; read the file back with read_trade_log().
+    """
+
+    def __init__(self, path, buffer_size=65536):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.buffer = np.empty(buffer_size, dtype=TRADE_DTYPE)
+        self.count = 0
+
+    def record(self, step, node, agent1, agent2, sold1, sold2, wealth1, wealth2):
+        self.buffer[self.count] = (step, node, agent1, agent2, sold1, sold2, wealth1, wealth2)
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def record_many(self, step, node, agent1, agent2, sold1, sold2, wealth1, wealth2):
+        """Record many trades at once: every argument but step is an array with one entry per trade."""
+        columns = {'node': node, 'agent1': agent1, 'agent2': agent2, 'sold1': sold1, 'sold2': sold2,
+                   'wealth1': wealth1, 'wealth2': wealth2}
+        start = 0
+        while start < len(agent1):
+            take = min(len(agent1) - start, len(self.buffer) - self.count)
+            block = self.buffer[self.count:self.count + take]
+            block['step'] = step
+            for name, values in columns.items():
+                block[name] = values[start:start + take]
+            self.count += take
+            start += take
+            if self.count == len(self.buffer):
+                self.flush()
+
+    def flush(self):
+        self.buffer[:self.count].tofile(self.file)
+        self.count = 0
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_trade_log(path):
+    """Load a TradeLog file as a structured array."""
+    return np.fromfile(path, dtype=TRADE_DTYPE)
@@ -0,0 +1,639 @@
+import functools
+import warnings
+
+import numpy as np
+
+from . import jit, parallel
+from .agents import VIEW_CLASSES
+from .behaviors import BEHAVIORS, behavior_code, trade_amount
+from .history import MovementHistory
+from .inventory import Inventory
+from .log import TRADE, logger
+from .movement import choose_moves, random_moves
+from .network import CompiledNetwork
+from .regions import AGENT_CLASSES, HISTORICAL_PRICES, REGIONS, class_index, node_class_function
+from .rng import MEETING, MOVEMENT, model_rngs, step_seed_sequence, worker_rngs
+from .trading import settle_trades
+
+
+class ArrayModel:
+    """
+    Structure-of-arrays version of TestModelINTEST (Historical_Protectionism and friends).
+
+    Every per-agent attribute of the old mesa agents is one array indexed by agent row,
+    rows are in the order the old schedule added the agents. step() reproduces
+    TestModelINTEST.step(): all agents move, then agents on the same node meet and trade.
+    model.schedule.agents returns AgentView objects so existing run scripts keep working.
+    """
+
+    MOVEMENTS = ('cheapest', 'cheapest_by_value', 'random')
+    MEETINGS = ('greedy', 'shuffle')
+    TRADINGS = ('sequential', 'batched')
+    BACKENDS = ('numpy', 'jit')
+
+    def __init__(self, G, agents_per_node, incoming_customs_network=None, outgoing_customs_network=None,
+                 agent_behaviors=None, prices=HISTORICAL_PRICES, wealth=500, goods_per_agent=10,
+                 customs_in_cost=False, network=None, seed=None, trade_log=None, movement='cheapest',
+                 customs_factors=None, meeting='greedy', meeting_sample_size=5, transaction_costs=None,
+                 node_classes=None, extra_agent=None, profiler=None, movement_history=False, trading='sequential',
+                 backend='numpy', workers=1, replicates=1, common_random_numbers=False):
+        """
+        Initialize the model.
+
+        :param G: The graph, may be None if network is given.
+        :param agents_per_node: Dictionary specifying agents per node.
+        :param incoming_customs_network: Graph with the incoming customs per edge.
+        :param outgoing_customs_network: Graph with the outgoing customs per edge.
+        :param agent_behaviors: Dictionary of agent behaviors to reuse across runs.
+        :param prices: Pottery price per region, in REGIONS order.
+        :param wealth: Starting wealth of every agent.
+        :param goods_per_agent: Number of pottery units every agent starts with.
+        :param customs_in_cost: Charge the customs of the previous move on the next one.
+            The old agent classes read the last customs weights only if the agent has a
+            last_traveled_edge_weight attribute, which is never set, so customs never
+            entered the move cost. The default keeps that behavior.
+        :param network: CompiledNetwork of G and the customs networks, compiled here if not given.
+        :param seed: int or numpy SeedSequence the model's random streams derive from
+            (see engine.rng), fresh entropy if None.
+        :param trade_log: engine.log.TradeLog receiving a binary record of every trade.
+        :param movement: 'cheapest': cheapest affordable of 5 sampled neighbors, transport
+            plus customs (Historical_Protectionism and most scenarios). 'cheapest_by_value':
+            the same with transport weight times the value of the goods carried, no customs
+            (Customs/*). 'random': a random neighbor, paid even if unaffordable (Price/*,
+            TransactionCost/*).
+        :param customs_factors: Dictionary of (incoming, outgoing) factors by agent class
+            name, 'default' for the other classes, (1, 1) if not given. Scales the customs
+            of the previous move that customs_in_cost charges.
+        :param meeting: 'greedy': repeatedly pick a cheapest pair among up to
+            meeting_sample_size active agents of a node (None: all of them). 'shuffle':
+            shuffle all agents of a node and pair neighbors, trading only active pairs of
+            different types (Price/*).
+        :param transaction_costs: Square table of pair costs indexed by the type_ids of
+            both agents, 0 for the same type and 1 otherwise if not given.
+        :param node_classes: Dictionary of agent class name by node, overriding the
+            REGIONS order for those nodes, or a function of the node returning its class
+            name (see regions.node_class_function()).
+        :param extra_agent: Class name of one more agent added to every node after its
+            merchants (e.g. 'AgentPrivate'), holding one unit of every pottery.
+        :param profiler: engine.profiling.PhaseProfiler timing the phases of every step.
+        :param movement_history: Record the nodes every agent moves to (see
+            engine.history.MovementHistory): True for the whole run, a number of steps to
+            keep only the last ones, False (default) not to record them. A whole history
+            takes a byte or two per agent and step, gigabytes for big runs.
+        :param trading: 'sequential' (default): every pair trades as soon as it is formed,
+            with scalar draws. 'batched': the meetings of a step only form the pairs, which
+            are then settled together by trade_pairs() (see engine.trading), the same
+            rules with vectorized draws; faster with many agents per step.
+        :param backend: 'numpy' (default) or 'jit': movement, pair selection and trade
+            settlement run as compiled loops (engine.jit, needs numba). The meetings form
+            the pairs of the step and trade_pairs() settles them, as with trading='batched'.
+            Without numba, 'jit' warns and falls back to 'numpy' with batched trading.
+        :param workers: Threads of the meeting phase with backend='jit'. The nodes are
+            split into that many parts of about equal agents, which form their pairs at the
+            same time, and the pairs are settled in as many chunks (see engine.parallel).
+            Every worker draws from a stream of its own (engine.rng.worker_rngs) for the
+            nodes of its part, and the parts follow the agents over the nodes. Results are
+            reproducible for a given seed and number of workers, but a run with workers=1
+            and one with workers=4 of the same seed differ (they agree statistically).
+        :param replicates: Independent replicates simulated together. The agents are
+            repeated replicates times, replicate r on its own copy of the network (agent
+            rows r * replicate_size onward, see CompiledNetwork.tile()), so every agent
+            array reshapes to (replicates, replicate_size) and movement, meetings and trades
+            of all replicates run as one array program. The replicates share
+            agent_behaviors (drawn once if not given) and the model's random streams.
+            replicate_steps counts the steps each replicate had active agents. Best with
+            trading='batched' or backend='jit'. A replicate without active agents stops:
+            its agents no longer move or meet, like a lone run_model() run ends.
+        :param common_random_numbers: Restart the random streams at the movement and the
+            meeting phase of every step from the seed, the step and the phase (see
+            align_streams()), so models of different scenarios with the same seed use the
+            same random numbers phase by phase and their paired differences have a small
+            variance (see engine.compare).
+        """
+        if movement not in self.MOVEMENTS:
+            raise ValueError(f"Unknown movement {movement!r}, expected one of {self.MOVEMENTS}")
+        if meeting not in self.MEETINGS:
+            raise ValueError(f"Unknown meeting {meeting!r}, expected one of {self.MEETINGS}")
+        if trading not in self.TRADINGS:
+            raise ValueError(f"Unknown trading {trading!r}, expected one of {self.TRADINGS}")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {self.BACKENDS}")
+        if backend == 'jit' and not jit.jit_available():
+            warnings.warn("numba is not installed, using the NumPy kernels (backend='numpy', trading='batched')",
+                          RuntimeWarning, stacklevel=2)
+            backend, trading = 'numpy', 'batched'
+        if replicates < 1:
+            raise ValueError(f"Expected at least 1 replicate, got {replicates}")
+        if workers < 1:
+            raise ValueError(f"Expected at least 1 worker, got {workers}")
+        if workers > 1 and backend != 'jit':
+            warnings.warn("Parallel meetings need backend='jit', meeting on one thread", RuntimeWarning, stacklevel=2)
+            workers = 1
+        self.G = G
+        self.incoming_customs_network = incoming_customs_network
+        self.outgoing_customs_network = outgoing_customs_network
+        self.customs_in_cost = customs_in_cost
+        self.movement = movement
+        self.meeting = meeting
+        self.meeting_sample_size = meeting_sample_size
+        self.trading = trading
+        self.backend = backend
+        self.workers = workers
+        self.common_random_numbers = common_random_numbers
+        self.seed_sequence, self.rng, self.random = model_rngs(seed)
+        self.worker_rngs = worker_rngs(self.seed_sequence, workers) if workers > 1 else []
+        self.trade_log = trade_log
+        self.steps = 0
+        self._log_trades = False
+        self.network = network or CompiledNetwork(G, incoming=incoming_customs_network,
+                                                  outgoing=outgoing_customs_network)
+        self.nodes = self.network.nodes
+        self.node_index = self.network.node_index
+        self.replicates = replicates
+        self.current_id = 0
+        self.agent_behaviors = agent_behaviors or {}  # Use existing behaviors or create new ones
+
+        node_class = node_class_function(node_classes)
+        extra_class = class_index(extra_agent) if extra_agent is not None else None
+
+        unique_ids, positions, regions, behaviors = [], [], [], []
+        behavior = None
+        for node in self.nodes:
+            num_agents = agents_per_node.get(node, 0)
+            if num_agents:
+                region = node_class(node)
+
+            for _ in range(num_agents):
+                agent_id = self.next_id()
+
+                # Assign fixed trade behavior if available, else create new
+                if agent_id in self.agent_behaviors:
+                    behavior = self.agent_behaviors[agent_id]
+                else:
+                    behavior = self.random.choice(BEHAVIORS)
+                    self.agent_behaviors[agent_id] = behavior
+
+                unique_ids.append(agent_id)
+                positions.append(self.node_index[node])
+                regions.append(region)
+                behaviors.append(behavior_code(behavior))
+
+            if extra_class is not None:
+                # The old models gave the extra agent the behavior of the last merchant
+                # created; it is not part of agent_behaviors.
+                if behavior is None:
+                    behavior = self.random.choice(BEHAVIORS)
+                unique_ids.append(self.next_id())
+                positions.append(self.node_index[node])
+                regions.append(extra_class)
+                behaviors.append(behavior_code(behavior))
+
+        self.replicate_size = len(unique_ids)
+        if replicates > 1:
+            # the agents of replicate r on copy r of the network, replicate-major
+            num_nodes = len(self.nodes)
+            self.network = self.network.tile(replicates)
+            self.nodes = self.network.nodes
+            unique_ids, regions, behaviors = unique_ids * replicates, regions * replicates, behaviors * replicates
+            positions = [position + r * num_nodes for r in range(replicates) for position in positions]
+        self.replicate_steps = np.zeros(replicates, dtype=np.int64)
+        self.finished = None  # per agent row, whether its replicate has stopped (see step())
+
+        n = len(unique_ids)
+        self.num_agents = n
+        self.unique_id = np.array(unique_ids, dtype=np.int64)
+        self.region = np.array(regions, dtype=np.int16)
+        self.type_id = np.array([AGENT_CLASSES[r].type_id for r in regions], dtype=np.int16)
+        self.pos = np.array(positions, dtype=np.int32)
+        self.behavior = np.array(behaviors, dtype=np.int8)
+        self.wealth = np.full(n, wealth, dtype=np.float64)
+        self.active = np.ones(n, dtype=bool)
+        self.num_active = n  # kept up to date by deactivate() and set_active()
+        self.step_moves = 0  # moves and goods sold during the last step
+        self.step_sales = 0
+        self.has_traded = np.zeros(n, dtype=bool)
+        self.last_incoming = np.zeros(n, dtype=np.float64)
+        self.last_outgoing = np.zeros(n, dtype=np.float64)
+        self.last_transport = np.zeros(n, dtype=np.float64)
+
+        # Customs factors of every agent, columns incoming and outgoing
+        customs_factors = customs_factors or {}
+        default = customs_factors.get('default', (1, 1))
+        by_class = [customs_factors.get(c.class_name, customs_factors.get(c.type, default)) for c in AGENT_CLASSES]
+        self.customs_factors = np.array(by_class, dtype=np.float64)[self.region]
+
+        # Transaction cost of a pair by type ids, as nested lists for the scalar meeting loop
+        if transaction_costs is None:
+            num_types = max(c.type_id for c in AGENT_CLASSES) + 1
+            transaction_costs = 1 - np.eye(num_types, dtype=np.int64)
+        self.transaction_costs = np.asarray(transaction_costs).tolist()
+        self.cost_table = np.asarray(transaction_costs, dtype=np.float64)
+
+        self.inventory = Inventory(n, [region.good for region in REGIONS], prices)
+        regular = np.flatnonzero(self.region < len(REGIONS))
+        self.inventory.add(regular, self.region[regular], goods_per_agent)
+        for good in range(len(REGIONS)):
+            self.inventory.add(np.flatnonzero(self.region >= len(REGIONS)), good)
+        self.history = None
+        if movement_history:
+            length = None if movement_history is True else movement_history
+            self.history = MovementHistory(n, self.nodes, length)
+
+        self._views = [VIEW_CLASSES[r](self, i) for i, r in enumerate(regions)]
+
+        self.profiler = None
+        if profiler is not None:
+            profiler.attach(self)
+
+    @property
+    def schedule(self):
+        """The run scripts read model.schedule.agents, the model plays the scheduler."""
+        return self
+
+    @property
+    def agents(self):
+        """Agent views in schedule order."""
+        return self._views
+
+    def next_id(self):
+        """Return the next unique ID for an agent."""
+        self.current_id += 1
+        return self.current_id
+
+    def get_num_agents(self):
+        """Return the current number of agents in the model."""
+        return self.num_agents
+
+    def deactivate(self, agents):
+        """Mark the given agent rows inactive."""
+        agents = agents[self.active[agents]]
+        self.active[agents] = False
+        self.num_active -= len(agents)
+
+    def set_active(self, i, value):
+        """Set the active flag of agent row i."""
+        if self.active[i] != value:
+            self.active[i] = value
+            self.num_active += 1 if value else -1
+
+    def customs_cost(self, agents):
+        """Customs charged on the next move of the given agents (see customs_in_cost)."""
+        if not self.customs_in_cost:
+            return np.zeros(len(agents))
+        factors = self.customs_factors[agents]
+        return self.inventory.sizes[agents] * (factors[:, 0] * self.last_incoming[agents] +
+                                               factors[:, 1] * self.last_outgoing[agents])
+
+    def align_streams(self, phase):
+        """
+        Restart the random streams (rng, random and the workers') for a phase of the
+        current step under common random numbers (see rng.step_seed_sequence()).
+        Returns the seed sequence of the phase.
+        """
+        sequence = step_seed_sequence(self.seed_sequence, self.steps, phase)
+        _, self.rng, self.random = model_rngs(sequence)
+        if self.worker_rngs:
+            self.worker_rngs = worker_rngs(sequence, self.workers)
+        return sequence
+
+    def move_agents(self):
+        """Move all agents at once, the batched equivalent of calling move_agent() for every row."""
+        if self.common_random_numbers:
+            self.align_streams(MOVEMENT)
+        # Broke agents are deactivated and stay put
+        broke = self.wealth <= 0
+        self.deactivate(np.flatnonzero(broke))
+        agents = np.flatnonzero(~broke if self.finished is None else ~broke & ~self.finished)
+
+        # Reset the has_traded flag so the agents can trade again
+        self.has_traded[agents] = False
+
+        network = self.network
+        agents = agents[network.degree[self.pos[agents]] > 0]
+        if len(agents) == 0:
+            return
+        # Under common random numbers every agent row takes its draws, moving or not, so
+        # the numbers of an agent do not depend on which other agents move
+        rows, moving = (np.arange(self.num_agents), agents) if self.common_random_numbers else (agents, slice(None))
+        if self.movement == 'random':
+            # A random neighbor, paid whether or not the agent can afford it
+            edges = random_moves(self.rng, network.indptr, self.pos[rows])[moving]
+            cost = network.weight[edges]
+        else:
+            if self.movement == 'cheapest_by_value':
+                scale, extra_cost = self.inventory.counts[rows] @ self.inventory.prices, 0
+            else:
+                scale, extra_cost = 1, self.customs_cost(rows)
+            if self.common_random_numbers:
+                choose = functools.partial(choose_moves, aligned=True)
+            else:
+                choose = jit.choose_moves if self.backend == 'jit' else choose_moves
+            edges, cost = choose(self.rng, network.indptr, network.weight, self.pos[rows],
+                                 self.wealth[rows], extra_cost, scale=scale)
+            edges, cost = edges[moving], cost[moving]
+
+            # If no affordable move is found, deactivate the agent
+            stuck = edges < 0
+            self.deactivate(agents[stuck])
+            agents, edges, cost = agents[~stuck], edges[~stuck], cost[~stuck]
+
+        customs = network.customs
+        self.last_incoming[agents] = customs['incoming'][edges] if 'incoming' in customs else 0
+        self.last_outgoing[agents] = customs['outgoing'][edges] if 'outgoing' in customs else 0
+        self.last_transport[agents] = network.weight[edges]
+        self.pos[agents] = network.indices[edges]
+        self.wealth[agents] -= cost
+        self.step_moves += len(agents)
+        if self.movement == 'random':
+            # If the agent runs out of wealth after moving, deactivate it
+            self.deactivate(agents[self.wealth[agents] <= 0])
+
+        # Log the movement to history
+        if self.history is not None:
+            self.history.record(self.steps, agents, self.pos[agents])
+
+    def move_agent(self, i):
+        '''Moves agent i one step according to the movement rule (by default to the cheapest of 5 random neighbors).'''
+        if self.wealth[i] <= 0:
+            self.set_active(i, False)
+            return
+
+        # Reset the has_traded flag so the agent can trade again
+        self.has_traded[i] = False
+
+        # Edges leaving the agent's node, as CSR edge ids
+        network = self.network
+        start, stop = network.indptr[self.pos[i]], network.indptr[self.pos[i] + 1]
+        if start == stop:
+            return
+
+        if self.movement == 'random':
+            # Randomly choose one neighbor to move to, paid whether or not it is affordable
+            best_move = self.random.randrange(start, stop)
+            min_total_cost = network.weight[best_move]
+        else:
+            potential_moves = self.random.sample(range(start, stop), min(5, stop - start))
+            if self.movement == 'cheapest_by_value':
+                scale, customs_cost = self.inventory.counts[i] @ self.inventory.prices, 0
+            else:
+                scale, customs_cost = 1, self.customs_cost([i])[0]
+
+            # Find the edge with the minimum travel cost that the agent can afford
+            wealth = self.wealth[i]
+            min_total_cost = float('inf')
+            best_move = None
+            for edge in potential_moves:
+                total_cost = network.weight[edge] * scale + customs_cost
+                if total_cost < min_total_cost and wealth >= total_cost:
+                    min_total_cost = total_cost
+                    best_move = edge
+
+            if best_move is None:
+                # If no affordable move is found, deactivate the agent
+                self.set_active(i, False)
+                return
+
+        customs = network.customs
+        self.last_incoming[i] = customs['incoming'][best_move] if 'incoming' in customs else 0
+        self.last_outgoing[i] = customs['outgoing'][best_move] if 'outgoing' in customs else 0
+        self.last_transport[i] = network.weight[best_move]
+        self.pos[i] = network.indices[best_move]
+        self.wealth[i] -= min_total_cost
+        self.step_moves += 1
+        if self.history is not None:
+            self.history.record(self.steps, i, self.pos[i])
+        if self.movement == 'random' and self.wealth[i] <= 0:
+            # If the agent runs out of wealth after moving, deactivate it
+            self.set_active(i, False)
+
+    def trade(self, a, b):
+        """
+        Handle the trading logic between agents a and b.
+        For each good that is traded, select the cheapest of three randomly chosen options from the receiver's inventory.
+        Returns whether the agents traded.
+        """
+        if not (self.active[a] and self.active[b]) or self.has_traded[a] or self.has_traded[b]:
+            return False
+
+        # Get trade amounts based on behaviors
+        inventory = self.inventory
+        size_a, size_b = inventory.sizes[a], inventory.sizes[b]
+        trade_amount_a = trade_amount(self.behavior[a], size_a, self.random)
+        trade_amount_b = trade_amount(self.behavior[b], size_b, self.random)
+
+        # Randomly select goods to trade based on trade amounts
+        goods_traded_by_a = inventory.sample(a, min(trade_amount_a, size_a), self.random)
+        goods_traded_by_b = inventory.sample(b, min(trade_amount_b, size_b), self.random)
+
+        sold_a = self._sell(a, b, goods_traded_by_a)
+        sold_b = self._sell(b, a, goods_traded_by_b)
+        self.step_sales += sold_a + sold_b
+
+        # Mark both agents as having traded
+        self.has_traded[a] = True
+        self.has_traded[b] = True
+
+        if self.trade_log is not None:
+            self.trade_log.record(self.steps, self.pos[a], self.unique_id[a], self.unique_id[b], sold_a, sold_b,
+                                  self.wealth[a], self.wealth[b])
+        if self._log_trades:
+            logger.log(TRADE, "Trade completed: Agent %d traded %d goods with Agent %d.",
+                       self.unique_id[a], len(goods_traded_by_a), self.unique_id[b])
+            logger.log(TRADE, "Post-trade: Agent %d Wealth=%s, Goods=%d; Agent %d Wealth=%s, Goods=%d",
+                       self.unique_id[a], self.wealth[a], inventory.sizes[a],
+                       self.unique_id[b], self.wealth[b], inventory.sizes[b])
+        return True
+
+    def _sell(self, seller, buyer, goods_traded):
+        """
+        Swap every good in goods_traded for the cheapest of three options of the buyer, if affordable.
+        Returns the number of goods actually swapped.
+        """
+        inventory = self.inventory
+        prices = inventory.prices.tolist()
+        sold = 0
+        for good in goods_traded:
+            good_price = prices[good]
+            # Ensure the buyer can afford the good and has something to give in return
+            if self.wealth[buyer] < good_price or inventory.sizes[buyer] == 0:
+                continue
+            # Randomly choose up to 3 options from the buyer's goods to trade, take the cheapest
+            options = inventory.sample(buyer, min(3, inventory.sizes[buyer]), self.random)
+            option = min(options, key=prices.__getitem__)
+
+            self.wealth[buyer] -= good_price
+            self.wealth[seller] += good_price
+            inventory.remove(seller, good)
+            inventory.add(buyer, good)
+            inventory.remove(buyer, option)
+            inventory.add(seller, option)
+            sold += 1
+        return sold
+
+    def trade_pairs(self, first, second):
+        """
+        Settle the trades of many pairs at once, pairs (first[i], second[i]) are disjoint.
+
+        The batched counterpart of trade(): pairs that trade() would skip (an inactive agent,
+        or one that already traded) are dropped, the others trade in one vectorized pass.
+        Returns the number of pairs that traded.
+        """
+        first, second = np.asarray(first, dtype=np.int64), np.asarray(second, dtype=np.int64)
+        active, has_traded = self.active, self.has_traded
+        ok = active[first] & active[second] & ~has_traded[first] & ~has_traded[second]
+        first, second = first[ok], second[ok]
+        if len(first) == 0:
+            return 0
+        inventory = self.inventory
+        if self.worker_rngs:
+            settle, rng = parallel.settle_in_parts, self.worker_rngs
+        else:
+            settle, rng = jit.settle_trades if self.backend == 'jit' else settle_trades, self.rng
+        sold_first, sold_second = settle(rng, first, second, self.behavior, self.wealth,
+                                         inventory.counts, inventory.sizes, inventory.prices)
+        self.step_sales += int(sold_first.sum() + sold_second.sum())
+        has_traded[first] = True
+        has_traded[second] = True
+
+        if self.trade_log is not None:
+            self.trade_log.record_many(self.steps, self.pos[first], self.unique_id[first], self.unique_id[second],
+                                       sold_first, sold_second, self.wealth[first], self.wealth[second])
+        if self._log_trades:
+            for a, b, sold_a, sold_b in zip(first.tolist(), second.tolist(), sold_first.tolist(), sold_second.tolist()):
+                logger.log(TRADE, "Trade completed: Agent %d sold %d goods to Agent %d and bought %d.",
+                           self.unique_id[a], sold_a, self.unique_id[b], sold_b)
+                logger.log(TRADE, "Post-trade: Agent %d Wealth=%s, Goods=%d; Agent %d Wealth=%s, Goods=%d",
+                           self.unique_id[a], self.wealth[a], inventory.sizes[a],
+                           self.unique_id[b], self.wealth[b], inventory.sizes[b])
+        return len(first)
+
+    def agents_by_node(self, active_only=True):
+        """
+        Bucket the active agents (all agents of running replicates if not active_only) by node.
+
+        Returns (order, bounds): the agent rows sorted by node (schedule order within a
+        node) and the offsets such that order[bounds[n]:bounds[n + 1]] are the agents on
+        node n. One sort per step instead of one scan per node.
+        """
+        if active_only:
+            agents = np.flatnonzero(self.active)
+        else:
+            agents = np.arange(self.num_agents) if self.finished is None else np.flatnonzero(~self.finished)
+        order = agents[np.argsort(self.pos[agents], kind='stable')]
+        bounds = np.searchsorted(self.pos[order], np.arange(len(self.nodes) + 1))
+        return order, bounds
+
+    def meet_agents(self):
+        """Facilitate meetings between active agents on the same node considering transaction costs."""
+        self.meet_nodes(*self.agents_by_node(active_only=self.meeting != 'shuffle'))
+
+    def meet_nodes(self, order, bounds):
+        """Run the meetings of every node, given the agents bucketed by agents_by_node()."""
+        node_seeds = None
+        if self.common_random_numbers:
+            # the scalar meetings also restart their stream at every node, so the pairs and
+            # trades of a node do not depend on the draws of the nodes before it
+            node_seeds = self.align_streams(MEETING).generate_state(len(self.nodes), np.uint64).tolist()
+        shuffle = self.meeting == 'shuffle'
+        if self.backend == 'jit':
+            if shuffle:
+                pairs, args = jit.shuffle_pairs, (self.active, self.type_id)
+            else:
+                pairs, args = jit.greedy_pairs, (self.type_id, self.cost_table, self.meeting_sample_size)
+            if self.worker_rngs:
+                self.trade_pairs(*parallel.pairs_in_parts(self.worker_rngs, order, bounds, pairs, *args))
+            else:
+                self.trade_pairs(*pairs(self.rng, order, bounds, *args))
+            return
+        if self.trading == 'batched':
+            # the meetings only collect the pairs, which trade together afterwards
+            pairs = []
+
+            def trade(a, b):
+                pairs.append((a, b))
+        else:
+            trade = self.trade
+        # Only nodes with at least two agents can host a meeting
+        for node in np.flatnonzero(np.diff(bounds) > 1):
+            if self._log_trades:
+                logger.log(TRADE, "Number of agents on node %s: %d", self.nodes[node], bounds[node + 1] - bounds[node])
+            agents_on_node = order[bounds[node]:bounds[node + 1]].tolist()
+            if node_seeds is not None:
+                self.random.seed(node_seeds[node])
+            if shuffle:
+                self.shuffle_on_node(agents_on_node, trade)
+            else:
+                self.meet_on_node(agents_on_node, trade)
+        if self.trading == 'batched' and pairs:
+            self.trade_pairs(*zip(*pairs))
+
+    def shuffle_on_node(self, agents_on_node, trade=None):
+        """
+        Shuffle the agents of a node and trade neighbors in the shuffled list if both are active and of different types.
+        trade(a, b) is called for every pair, self.trade by default.
+        """
+        trade = trade or self.trade
+        self.random.shuffle(agents_on_node)
+        active, type_id = self.active, self.type_id
+        for x in range(0, len(agents_on_node) - 1, 2):
+            a, b = agents_on_node[x], agents_on_node[x + 1]
+            if active[a] and active[b] and type_id[a] != type_id[b]:
+                trade(a, b)
+
+    def meet_on_node(self, agents_on_node, trade=None):
+        """
+        Pair up and trade the given agents, which are all on the same node. Consumes the list.
+        trade(a, b) is called for every pair, self.trade by default.
+        """
+        trade = trade or self.trade
+        type_id = self.type_id
+        costs = self.transaction_costs
+        sample_size = self.meeting_sample_size
+        # Continue pairing agents until less than 2 agents remain
+        while len(agents_on_node) > 1:
+            # Randomly select up to sample_size agents from the list (by position in the list)
+            if sample_size is not None and len(agents_on_node) > sample_size:
+                selected = self.random.sample(range(len(agents_on_node)), sample_size)
+            else:
+                selected = range(len(agents_on_node))
+
+            # Transaction cost of every pair, by the type ids of both agents
+            pair_costs = []
+            for x in range(len(selected)):
+                for y in range(x + 1, len(selected)):
+                    p, q = selected[x], selected[y]
+                    cost = costs[type_id[agents_on_node[p]]][type_id[agents_on_node[q]]]
+                    pair_costs.append((cost, p, q))
+
+            # Randomly select one pair among those with minimum cost
+            min_cost = min(pair[0] for pair in pair_costs)
+            min_cost_pairs = [pair for pair in pair_costs if pair[0] == min_cost]
+            _, p, q = self.random.choice(min_cost_pairs)
+            a, b = agents_on_node[p], agents_on_node[q]
+
+            # Remove the pair by moving the last agents into their slots, higher position first
+            for position in sorted((p, q), reverse=True):
+                agents_on_node[position] = agents_on_node[-1]
+                agents_on_node.pop()
+            trade(a, b)
+            if self._log_trades:
+                logger.log(TRADE, "Trade between Agent %d and Agent %d with cost %s",
+                           self.unique_id[a], self.unique_id[b], min_cost)
+
+    def step(self):
+        """Advance the model by one step: every agent moves, then agents on the same node trade."""
+        # the level is looked up once per step, not once per trade
+        self._log_trades = logger.isEnabledFor(TRADE)
+        self.step_moves = self.step_sales = 0
+        running = self.active.reshape(self.replicates, -1).any(axis=1)
+        self.replicate_steps += running
+        if self.replicates > 1:
+            # replicates without active agents stop, their final state is that of the step they ended
+            self.finished = None if running.all() else np.repeat(~running, self.replicate_size)
+        if self.profiler is None:
+            self.move_agents()
+            self.meet_agents()
+        else:
+            self.profiler.profile_step(self)
+        self.steps += 1
+
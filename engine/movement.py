@@ -0,0 +1,73 @@
+import numpy as np
+
+
+def sample_edges(rng, indptr, pos, sample_size=5, aligned=False):
+    """
+    Draw up to sample_size distinct edges leaving pos, for every agent at once.
+
+    Returns an (agents x sample_size) array of CSR edge ids, -1 where the node has fewer
+    edges than sample_size. Nodes with more edges use Floyd's algorithm, which gives a
+    uniformly random subset with sample_size draws and no per-agent Python loop.
+
+    :param aligned: Draw sample_size numbers for every agent, also where the node has few
+        edges, so the numbers of an agent do not depend on the positions of the others
+        (common random numbers).
+    """
+    start = indptr[pos]
+    degree = indptr[pos + 1] - start
+    offsets = np.full((len(pos), sample_size), -1, dtype=np.int64)
+
+    # few neighbors: take them all
+    columns = np.arange(sample_size)
+    few = degree <= sample_size
+    offsets[few] = np.where(columns < degree[few, None], columns, -1)
+
+    # many neighbors: Floyd's algorithm, column r draws from 0..degree - sample_size + r
+    many = np.flatnonzero(~few)
+    # aligned: the draws of column r are row r, taken whether or not any node has many edges
+    draws = rng.random((sample_size, len(pos))) if aligned else None
+    if len(many):
+        d = degree[many]
+        chosen = offsets[many]
+        for r in range(sample_size):
+            upper = d - sample_size + r
+            u = draws[r, many] if aligned else rng.random(len(many))
+            t = (u * (upper + 1)).astype(np.int64)
+            taken = (chosen[:, :r] == t[:, None]).any(axis=1)
+            chosen[:, r] = np.where(taken, upper, t)
+        offsets[many] = chosen
+
+    return np.where(offsets >= 0, start[:, None] + offsets, -1)
+
+
+def choose_moves(rng, indptr, weight, pos, wealth, extra_cost=0, sample_size=5, scale=1, aligned=False):
+    """
+    Batched movement rule of the old agent classes.
+
+    Every agent looks at up to sample_size random edges leaving its node and takes the
+    cheapest one it can afford (transport weight times scale plus extra_cost, e.g.
+    customs). Ties are broken uniformly at random, like the first-of-a-random-sample
+    rule of step().
+
+    :param aligned: Sample with a fixed number of draws per agent, see sample_edges().
+    :return: (edge, cost) per agent, edge is -1 where no sampled edge is affordable.
+    """
+    edges = sample_edges(rng, indptr, pos, sample_size, aligned)
+    valid = edges >= 0
+    cost = weight[np.where(valid, edges, 0)] * np.reshape(scale, (-1, 1)) + np.reshape(extra_cost, (-1, 1))
+    cost[~valid] = np.inf
+    cost[cost > wealth[:, None]] = np.inf
+
+    min_cost = cost.min(axis=1)
+    tied = (cost == min_cost[:, None]) & np.isfinite(cost)
+    pick = np.argmax(np.where(tied, rng.random(cost.shape), -1.0), axis=1)
+
+    rows = np.arange(len(pos))
+    edge = np.where(np.isfinite(min_cost), edges[rows, pick], -1)
+    return edge, min_cost
+
+
+def random_moves(rng, indptr, pos):
+    """One uniformly random edge leaving pos for every agent (pos must have edges)."""
+    start = indptr[pos]
+    return start + (rng.random(len(pos)) * (indptr[pos + 1] - start)).astype(np.int64)
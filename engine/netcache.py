@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from .network import CompiledNetwork, load_network
+
+# Bump when the layout of the cached arrays changes, older entries are then rebuilt
+FORMAT_VERSION = 1
+CACHE_ENV = 'ROMAN_ECONOMY_NETWORK_CACHE'
+CACHE_DIRNAME = '__netcache__'
+
+
+def file_digest(filename):
+    """SHA-256 of the bytes of a file, as hex."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_root(network_file, cache_dir=None):
+    """
+    Directory the compiled networks are kept in: cache_dir if given, else the directory
+    in the ROMAN_ECONOMY_NETWORK_CACHE environment variable, else __netcache__ next to
+    the transport network file (like __pycache__).
+    """
+    return cache_dir or os.environ.get(CACHE_ENV) or os.path.join(os.path.dirname(os.path.abspath(network_file)),
+                                                                 CACHE_DIRNAME)
+
+
+def cache_key(digests):
+    """Key of a compiled network, from the digests of its files by role."""
+    text = json.dumps({'version': FORMAT_VERSION, 'files': digests}, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def load_compiled(network_file, cache_dir=None, **customs_files):
+    """
+    CompiledNetwork of a transport network file and customs network files, compiled once.
+
+    The first call reads and checks the ;-separated edge lists (see read_edges()),
+    compiles them and saves the arrays in a directory of the cache named after the
+    SHA-256 of the file contents; later calls, in this process or any other, only hash
+    the files and memory-map the saved arrays. Editing a file changes its hash, so a
+    stale entry is never used. The network is pickled as its cache directory, so worker
+    processes map the same files too.
+
+        network = load_compiled('days_network_full.csv', incoming='incoming_customs_network.csv',
+                                outgoing='outgoing_customs_network.csv')
+        model = ArrayModel(None, agents_per_node, network=network)
+
+    :param network_file: Transport network, edge weight is the transport cost.
+    :param cache_dir: Cache directory, see cache_root().
+    :param customs_files: Customs network files by name (incoming=..., outgoing=...),
+        None entries are skipped.
+    """
+    files = {name: filename for name, filename in customs_files.items() if filename is not None}
+    digests = {name: file_digest(filename) for name, filename in files.items()}
+    digests[''] = file_digest(network_file)  # '' cannot clash with a customs network name
+    root = cache_root(network_file, cache_dir)
+    stem = os.path.splitext(os.path.basename(network_file))[0]
+    path = os.path.join(root, f'{stem}-{cache_key(digests)[:16]}')
+    if not os.path.exists(os.path.join(path, 'network.json')):
+        network = CompiledNetwork(load_network(network_file),
+                                  **{name: load_network(filename) for name, filename in files.items()})
+        os.makedirs(root, exist_ok=True)
+        # save to a fresh directory and rename it into place, so that processes compiling
+        # the same network at once never see a partial entry
+        staging = tempfile.mkdtemp(dir=root, prefix=f'.{stem}-')
+        try:
+            network.save(staging)
+            os.rename(staging, path)
+        except OSError:
+            if not os.path.exists(os.path.join(path, 'network.json')):
+                raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    return CompiledNetwork.load(path)
+
@@ -0,0 +1,171 @@
+import csv
+import json
+import math
+import os
+
+import networkx as nx
+import numpy as np
+
+
+class CompiledNetwork:
+    """
+    Transport graph and customs graphs compiled to arrays.
+
+    The adjacency of G is stored in CSR form: the edges leaving node u are
+    indptr[u]:indptr[u + 1], indices holds their target nodes and weight their transport
+    cost. Every customs network becomes one more array aligned with those edges (0 where
+    the customs network has no such edge), so a move is evaluated with plain array
+    lookups by edge id instead of networkx dict-of-dict lookups. Neighbors keep the
+    order of G.neighbors().
+    """
+
+    def __init__(self, G, **customs_networks):
+        """
+        :param G: The transport graph, edge attribute 'weight' is the transport cost.
+        :param customs_networks: Customs graphs by name, e.g. incoming=..., outgoing=...
+        """
+        self.nodes = list(G.nodes)
+        self.node_index = {node: i for i, node in enumerate(self.nodes)}
+
+        degrees = [len(G.adj[node]) for node in self.nodes]
+        self.indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        np.cumsum(degrees, out=self.indptr[1:])
+        self.degree = np.diff(self.indptr)
+        self.indices = np.array([self.node_index[target] for node in self.nodes for target in G.adj[node]],
+                                dtype=np.int32)
+        self.weight = np.array([attrs['weight'] for node in self.nodes for attrs in G.adj[node].values()],
+                               dtype=np.float64)
+        self.customs = {name: self.edge_weights(network) for name, network in customs_networks.items()
+                        if network is not None}
+        self.path = None  # directory the arrays were loaded from, see load()
+
+    def __reduce__(self):
+        # a network loaded from disk is sent to worker processes as its directory, and
+        # every worker maps the same files instead of unpickling a copy of the arrays
+        if self.path is not None:
+            return type(self).load, (self.path,)
+        return super().__reduce__()
+
+    def save(self, path):
+        """Write the arrays to directory path, one .npy file each, for load()."""
+        os.makedirs(path, exist_ok=True)
+        arrays = {'nodes': np.array(self.nodes, dtype=np.float64), 'indptr': self.indptr,
+                  'indices': self.indices, 'weight': self.weight}
+        arrays.update({f'customs_{name}': weights for name, weights in self.customs.items()})
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), array)
+        with open(os.path.join(path, 'network.json'), 'w', encoding='utf-8') as file:
+            json.dump({'customs': list(self.customs)}, file)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Network saved with save(). The arrays are memory-mapped read-only by default, so
+        processes loading the same directory share one copy in the page cache.
+        """
+        with open(os.path.join(path, 'network.json'), 'r', encoding='utf-8') as file:
+            customs = json.load(file)['customs']
+
+        def array(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+
+        network = cls.__new__(cls)
+        network.nodes = array('nodes').tolist()
+        network.node_index = {node: i for i, node in enumerate(network.nodes)}
+        network.indptr = array('indptr')
+        network.degree = np.diff(network.indptr)
+        network.indices = array('indices')
+        network.weight = array('weight')
+        network.customs = {name: array(f'customs_{name}') for name in customs}
+        network.path = path
+        return network
+
+    def tile(self, copies):
+        """
+        Network of copies disjoint copies of this one, node u of copy r being node
+        r * num_nodes + u (see ArrayModel's replicates). Node ids repeat in every copy,
+        node_index maps them to the first one.
+        """
+        offsets = np.arange(copies)[:, None]
+        network = type(self).__new__(type(self))
+        network.nodes = list(self.nodes) * copies
+        network.node_index = self.node_index
+        network.indptr = np.concatenate([[0], (self.indptr[1:] + self.num_edges * offsets).ravel()])
+        network.degree = np.diff(network.indptr)
+        network.indices = (self.indices + self.num_nodes * offsets).ravel().astype(np.int32)
+        network.weight = np.tile(self.weight, copies)
+        network.customs = {name: np.tile(weights, copies) for name, weights in self.customs.items()}
+        network.path = None
+        return network
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        """Number of CSR entries (an undirected edge counts once per direction)."""
+        return len(self.indices)
+
+    @property
+    def sources(self):
+        """Source node of every CSR entry."""
+        return np.repeat(np.arange(self.num_nodes, dtype=np.int32), self.degree)
+
+    def edge_weights(self, network):
+        """Weights of another graph on the edges of G, 0 where it has no such edge."""
+        weights = np.zeros(self.num_edges, dtype=np.float64)
+        targets = [self.nodes[target] for target in self.indices.tolist()]
+        for u, source in enumerate(self.nodes):
+            adjacency = network.adj.get(source)
+            if not adjacency:
+                continue
+            for e in range(self.indptr[u], self.indptr[u + 1]):
+                attrs = adjacency.get(targets[e])
+                if attrs is not None:
+                    weights[e] = attrs['weight']
+        return weights
+
+    def dense(self, weights=None, missing=np.inf):
+        """
+        Node x node matrix of edge weights (transport cost by default).
+
+        Only sensible for small graphs such as the 11 Mediterranean regions.
+        """
+        weights = self.weight if weights is None else weights
+        matrix = np.full((self.num_nodes, self.num_nodes), missing, dtype=np.float64)
+        matrix[self.sources, self.indices] = weights
+        return matrix
+
+
+def read_edges(filename):
+    """
+    Read and check a ;-separated edge list (source;target;weight).
+
+    Every row must have three numbers and a finite, non-negative weight; blank lines are
+    skipped. Raises ValueError naming the file and line otherwise.
+
+    :return: List of (source, target, weight) float tuples, in file order.
+    """
+    edges = []
+    with open(filename, 'r', encoding='utf-8-sig') as file:
+        for number, line in enumerate(csv.reader(file, delimiter=';'), start=1):
+            if not line:
+                continue
+            if len(line) != 3:
+                raise ValueError(f"{filename}, line {number}: expected source;target;weight, got {';'.join(line)!r}")
+            try:
+                source, target, weight = map(float, line)
+            except ValueError:
+                raise ValueError(f"{filename}, line {number}: not a number in {';'.join(line)!r}") from None
+            if not math.isfinite(weight) or weight < 0:
+                raise ValueError(f"{filename}, line {number}: invalid weight {weight}")
+            edges.append((source, target, weight))
+    return edges
+
+
+def load_network(filename):
+    """Read a ;-separated edge list (source;target;weight) into a graph, like the run scripts."""
+    graph = nx.Graph()
+    graph.add_weighted_edges_from(read_edges(filename))
+    return graph
@@ -0,0 +1,213 @@
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for the Parquet output
+    pa = None
+
+from .aggregate import CLASS_KEYS, ID_KEYS
+from .runner import RUN_COLUMNS
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("The Parquet output needs pyarrow (pip install pyarrow)")
+
+
+def _field(name):
+    if name == 'Step Count':
+        return pa.field(name, pa.int32())
+    if name == 'Agent ID':
+        return pa.field(name, pa.int64())
+    if name in ('Agent Class', 'Trade Behavior'):
+        return pa.field(name, pa.dictionary(pa.int8(), pa.string()))
+    if name == 'Total Wealth':
+        return pa.field(name, pa.float64())
+    if name == 'Active':
+        return pa.field(name, pa.bool_())
+    return pa.field(name, pa.int32())  # good counts
+
+
+def rows_to_table(rows):
+    """Agent rows of one run (see engine.runner.agent_rows) as an Arrow table without the Run column."""
+    _require_pyarrow()
+    names = [name for name in (list(rows[0]) if rows else RUN_COLUMNS) if name != 'Run']
+    schema = pa.schema([_field(name) for name in names])
+    return pa.table({name: [row[name] for row in rows] for name in names}, schema=schema)
+
+
+class RunDataset:
+    """
+    Parquet dataset of the final agent states of many runs, partitioned by run.
+
+    Every run is one file, path/Run=<run>/part-0.parquet, so runs can be written in any
+    order as they complete and a single run can be read or rewritten on its own. The
+    Run column lives in the directory names (hive partitioning) and is added back when
+    the dataset is read.
+    """
+
+    def __init__(self, path):
+        _require_pyarrow()
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def run_file(self, run_number):
+        return os.path.join(self.path, f'Run={run_number}', 'part-0.parquet')
+
+    def write_run(self, run_number, rows):
+        """Write the agent rows of one run, replacing an earlier write of that run."""
+        filename = self.run_file(run_number)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        pq.write_table(rows_to_table(rows), filename)
+        return filename
+
+    def runs(self):
+        """Numbers of the runs in the dataset."""
+        return sorted(int(name.split('=', 1)[1]) for name in os.listdir(self.path)
+                      if name.startswith('Run=') and os.path.exists(os.path.join(self.path, name, 'part-0.parquet')))
+
+    def dataset(self):
+        """The runs as a pyarrow.dataset.Dataset."""
+        files = [self.run_file(run) for run in self.runs()]
+        # good columns are only written when a run has units of them, so the runs may differ
+        schema = pa.unify_schemas([pa.schema([pa.field('Run', pa.int32())])] +
+                                  [pq.read_schema(file) for file in files])
+        return ds.dataset(files, schema=schema, format='parquet', partitioning='hive',
+                          partition_base_dir=self.path)
+
+    def read(self, columns=None, runs=None):
+        """
+        Load the runs as a pandas DataFrame, laid out like the concatenated run CSV files.
+
+        :param columns: Columns to load, all by default.
+        :param runs: Run numbers to load, all by default.
+        """
+        dataset = self.dataset()
+        flt = ds.field('Run').isin(list(runs)) if runs is not None else None
+        data = dataset.to_table(columns=columns, filter=flt).to_pandas()
+        order = [name for name in ('Run', 'Agent ID') if name in data.columns]
+        return data.sort_values(order, ignore_index=True) if order else data
+
+    def aggregate(self):
+        """
+        Averages by Agent ID and by Agent Class, computed from the dataset.
+
+        Gives the same tables as the pd.concat/groupby of the run scripts, but the group
+        means are computed by Arrow on the columns, without building one big DataFrame
+        of all runs first. Missing good columns count as missing, like NaN in pandas.
+
+        :return: (average_data_by_id, average_data_by_class) DataFrames.
+        """
+        table = self.dataset().to_table()
+        values = [name for name in table.column_names if name not in ID_KEYS + ['Run', 'Step Count']]
+        by_id = _group_mean(table, ID_KEYS, values)
+        by_class = _group_mean(table, CLASS_KEYS, values)
+        return by_id, by_class
+
+
+class SweepDataset:
+    """
+    Parquet dataset of a parameter sweep: the final agent states of every (point, run).
+
+    Laid out like RunDataset with one more partition level, path/Point=<point>/Run=<run>/part-0.parquet,
+    and indexed by points.json, the parameter values of every point. Reading the dataset
+    adds the Point and Run columns and one column per swept parameter.
+    """
+
+    POINTS_FILE = 'points.json'
+
+    def __init__(self, path, points=None):
+        """
+        :param path: Directory of the dataset.
+        :param points: Parameter values of every point (list of dicts), written to the
+            index; read from it if None.
+        """
+        _require_pyarrow()
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        index = os.path.join(path, self.POINTS_FILE)
+        if points is None:
+            with open(index, 'r', encoding='utf-8') as file:
+                points = json.load(file)
+        else:
+            with open(index, 'w', encoding='utf-8') as file:
+                json.dump(points, file, indent=4)
+        self.points = points
+
+    def run_file(self, point, run_number):
+        return os.path.join(self.path, f'Point={point}', f'Run={run_number}', 'part-0.parquet')
+
+    def write_run(self, point, run_number, rows):
+        """Write the agent rows of one run of a point, replacing an earlier write of it."""
+        filename = self.run_file(point, run_number)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        pq.write_table(rows_to_table(rows), filename)
+        return filename
+
+    def runs(self):
+        """(point, run) pairs in the dataset."""
+        done = []
+        for point in range(len(self.points)):
+            directory = os.path.join(self.path, f'Point={point}')
+            if not os.path.isdir(directory):
+                continue
+            done.extend((point, int(name.split('=', 1)[1])) for name in os.listdir(directory)
+                        if name.startswith('Run=') and os.path.exists(os.path.join(directory, name, 'part-0.parquet')))
+        return sorted(done)
+
+    def dataset(self):
+        """The runs as a pyarrow.dataset.Dataset."""
+        files = [self.run_file(point, run) for point, run in self.runs()]
+        schema = pa.unify_schemas([pa.schema([pa.field('Point', pa.int32()), pa.field('Run', pa.int32())])] +
+                                  [pq.read_schema(file) for file in files])
+        return ds.dataset(files, schema=schema, format='parquet', partitioning='hive',
+                          partition_base_dir=self.path)
+
+    def parameters(self):
+        """The points as a DataFrame indexed by Point, one column per swept parameter."""
+        frame = pd.DataFrame(self.points)
+        frame.index.name = 'Point'
+        return frame
+
+    def read(self, columns=None, points=None):
+        """
+        Load the runs as a pandas DataFrame with the parameter values of their point.
+
+        :param columns: Columns to load, all by default.
+        :param points: Point numbers to load, all by default.
+        """
+        flt = ds.field('Point').isin(list(points)) if points is not None else None
+        data = self.dataset().to_table(columns=columns, filter=flt).to_pandas()
+        if 'Point' in data.columns:
+            data = data.join(self.parameters(), on='Point')
+        order = [name for name in ('Point', 'Run', 'Agent ID') if name in data.columns]
+        return data.sort_values(order, ignore_index=True) if order else data
+
+    def aggregate(self):
+        """
+        Averages by point and Agent Class, with the parameter values of every point.
+
+        :return: DataFrame indexed by (Point, Agent Class).
+        """
+        table = self.dataset().to_table()
+        values = [name for name in table.column_names
+                  if name not in ID_KEYS + ['Point', 'Run', 'Step Count']] + ['Step Count']
+        by_class = _group_mean(table, ['Point'] + CLASS_KEYS, values)
+        return by_class.join(self.parameters(), on='Point')
+
+
+def _group_mean(table, keys, values):
+    # dictionary columns group like their strings
+    for name in keys:
+        column = table.column(name)
+        if pa.types.is_dictionary(column.type):
+            table = table.set_column(table.column_names.index(name), name, column.cast(pa.string()))
+    grouped = table.group_by(keys).aggregate([(name, 'mean') for name in values])
+    grouped = grouped.rename_columns([name[:-len('_mean')] if name.endswith('_mean') else name
+                                      for name in grouped.column_names])
+    return grouped.to_pandas().set_index(keys)[values].sort_index()
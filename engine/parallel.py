@@ -0,0 +1,64 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import jit
+
+
+@functools.lru_cache(maxsize=None)
+def thread_pool(workers):
+    """Pool of worker threads shared by all models using that many workers."""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='engine-worker')
+
+
+def split_nodes(bounds, parts):
+    """
+    Split the nodes into parts ranges of consecutive nodes with about equal numbers of
+    agents, given the bounds of agents_by_node(). Returns the parts + 1 node offsets;
+    part k is nodes cuts[k]:cuts[k + 1], possibly none.
+    """
+    targets = np.linspace(0, bounds[-1], parts + 1)
+    cuts = np.minimum(np.searchsorted(bounds, targets), len(bounds) - 1)
+    cuts[0], cuts[-1] = 0, len(bounds) - 1
+    return cuts
+
+
+def _run_parts(rngs, run):
+    results = list(thread_pool(len(rngs)).map(run, range(len(rngs))))
+    return tuple(np.concatenate(column) for column in zip(*results))
+
+
+def pairs_in_parts(rngs, order, bounds, pairs, *args):
+    """
+    Run a pair selection of engine.jit (greedy_pairs or shuffle_pairs, called as
+    pairs(rng, order, bounds, *args)) on the nodes split into len(rngs) parts, part k
+    with rngs[k] on a thread of its own. A node's meetings only involve its own agents,
+    and the compiled kernels release the GIL, so the parts run at the same time.
+
+    :return: (first, second) of all parts, in node order.
+    """
+    cuts = split_nodes(bounds, len(rngs))
+
+    def run(k):
+        start, stop = cuts[k], cuts[k + 1]
+        return pairs(rngs[k], order[bounds[start]:bounds[stop]], bounds[start:stop + 1] - bounds[start], *args)
+
+    return _run_parts(rngs, run)
+
+
+def settle_in_parts(rngs, first, second, behavior, wealth, counts, sizes, prices):
+    """
+    jit.settle_trades() on len(rngs) consecutive chunks of the pairs, chunk k with
+    rngs[k] on a thread of its own. The pairs of a step are disjoint, so the chunks
+    update the rows of different agents.
+
+    :return: (goods first sold, goods second sold) per pair.
+    """
+    cuts = np.linspace(0, len(first), len(rngs) + 1).astype(np.int64)
+
+    def run(k):
+        chunk = slice(cuts[k], cuts[k + 1])
+        return jit.settle_trades(rngs[k], first[chunk], second[chunk], behavior, wealth, counts, sizes, prices)
+
+    return _run_parts(rngs, run)
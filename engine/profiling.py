@@ -0,0 +1,148 @@
+import json
+import time
+
+import numpy as np
+
+PHASES = ('movement', 'bucketing', 'pairing', 'trade')
+COUNTS = ('moves', 'trades', 'sales', 'deactivations', 'active')
+
+# Call stacks of the phases in the flame graph outputs
+STACKS = {
+    'movement': ('step', 'movement'),
+    'bucketing': ('step', 'meeting', 'bucketing'),
+    'pairing': ('step', 'meeting', 'pairing'),
+    'trade': ('step', 'meeting', 'trade'),
+}
+
+
+class PhaseProfiler:
+    """
+    Per-step time series of the phases of ArrayModel.step().
+
+    A model with a profiler runs its steps through profile_step(), which records the
+    wall time of movement, node bucketing, pair selection and trade execution, and the
+    number of moves, trades, goods sold and deactivations of every step. A model without
+    one runs its plain step, so a disabled profiler costs one attribute test per step.
+
+        profiler = PhaseProfiler()
+        model = ArrayModel(G, agents_per_node, incoming, outgoing, profiler=profiler)
+        ...
+        profiler.series()                 # dict of per-step arrays
+        profiler.write_folded('steps.folded')
+    """
+
+    def __init__(self):
+        self.clock = time.perf_counter
+        self.steps = []
+        self.starts = []  # start of every step, seconds since the profiler was created
+        self.times = {phase: [] for phase in PHASES}
+        self.counts = {name: [] for name in COUNTS}
+        self.origin = self.clock()
+        self._trade_time = 0.0
+        self._trades = 0
+
+    def attach(self, model):
+        """
+        Profile the steps of model. Its trade and trade_pairs methods are wrapped to time
+        and count the trades.
+        """
+        trade, trade_pairs = model.trade, model.trade_pairs
+        clock = self.clock
+
+        def timed_trade(a, b):
+            start = clock()
+            traded = trade(a, b)
+            self._trade_time += clock() - start
+            self._trades += traded
+            return traded
+
+        def timed_trade_pairs(first, second):
+            start = clock()
+            traded = trade_pairs(first, second)
+            self._trade_time += clock() - start
+            self._trades += traded
+            return traded
+
+        model.trade = timed_trade
+        model.trade_pairs = timed_trade_pairs
+        model.profiler = self
+
+    def profile_step(self, model):
+        """Run the phases of one step of model, recording their times and counts."""
+        clock = self.clock
+        active = model.num_active
+        self._trade_time = 0.0
+        self._trades = 0
+
+        start = clock()
+        model.move_agents()
+        moved = clock()
+        order, bounds = model.agents_by_node(active_only=model.meeting != 'shuffle')
+        bucketed = clock()
+        model.meet_nodes(order, bounds)
+        met = clock()
+
+        self.steps.append(model.steps)
+        self.starts.append(start - self.origin)
+        self.times['movement'].append(moved - start)
+        self.times['bucketing'].append(bucketed - moved)
+        self.times['pairing'].append(met - bucketed - self._trade_time)
+        self.times['trade'].append(self._trade_time)
+        self.counts['moves'].append(model.step_moves)
+        self.counts['trades'].append(self._trades)
+        self.counts['sales'].append(model.step_sales)
+        self.counts['deactivations'].append(active - model.num_active)
+        self.counts['active'].append(model.num_active)
+
+    def series(self):
+        """
+        The recorded steps as a dict of arrays: 'step', the seconds of every phase, 'total'
+        and the counts (moves, trades, goods sold, deactivations, active agents after the step).
+        """
+        result = {'step': np.array(self.steps, dtype=np.int64)}
+        for phase in PHASES:
+            result[phase] = np.array(self.times[phase])
+        result['total'] = sum(result[phase] for phase in PHASES) if self.steps else np.zeros(0)
+        for name in COUNTS:
+            result[name] = np.array(self.counts[name], dtype=np.int64)
+        return result
+
+    def totals(self):
+        """Seconds spent in every phase over all recorded steps."""
+        return {phase: float(np.sum(self.times[phase])) for phase in PHASES}
+
+    def write_folded(self, path):
+        """
+        Write the phase totals as folded stacks ('step;meeting;trade 1234', microseconds),
+        the input of flamegraph.pl, speedscope and inferno.
+        """
+        with open(path, 'w', encoding='utf-8') as file:
+            for phase, seconds in self.totals().items():
+                file.write(f"{';'.join(STACKS[phase])} {round(seconds * 1e6)}\n")
+
+    def write_trace(self, path):
+        """
+        Write the steps as a Chrome trace (chrome://tracing, Perfetto, speedscope): one
+        event per step and per phase, with the counts of the step as arguments. The trade
+        time of a step is spread over its meetings, so it is drawn as one block after the
+        pair selection.
+        """
+        def event(name, start, duration, **args):
+            return {'name': name, 'ph': 'X', 'pid': 0, 'tid': 0, 'ts': start, 'dur': duration, 'args': args}
+
+        events = []
+        for s, step in enumerate(self.steps):
+            start = self.starts[s] * 1e6
+            movement, bucketing, pairing, trade = (self.times[phase][s] * 1e6 for phase in PHASES)
+            meeting = start + movement
+            events += [
+                event('step', start, movement + bucketing + pairing + trade, step=step,
+                      **{name: self.counts[name][s] for name in COUNTS}),
+                event('movement', start, movement),
+                event('meeting', meeting, bucketing + pairing + trade),
+                event('bucketing', meeting, bucketing),
+                event('pairing', meeting + bucketing, pairing),
+                event('trade', meeting + bucketing + pairing, trade),
+            ]
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
@@ -0,0 +1,65 @@
+import functools
+from collections import namedtuple
+
+# One entry per trading region. The position in REGIONS is the node the region's
+# merchants start on (the if/elif chain in TestModelINTEST.__init__), type_id is the
+# id the old agent classes used for transaction costs.
+Region = namedtuple('Region', ['class_name', 'type', 'type_id', 'good'])
+
+REGIONS = (
+    Region('AgentAdria', 'Adria', 0, 'AdriaticPottery'),
+    Region('AgentAegean', 'Aegean', 1, 'AegeanPottery'),
+    Region('AgentBaetica', 'Baetica', 2, 'BaeticanPottery'),
+    Region('AgentEM', 'Eastern Mediterranean', 3, 'EMPottery'),
+    Region('AgentEgypt', 'Egypt', 4, 'EgyptianPottery'),
+    Region('AgentGallia', 'Gallia', 5, 'GallicPottery'),
+    Region('AgentIberia', 'Iberian Peninsula', 10, 'IberianPottery'),
+    Region('AgentItaly', 'Italy', 6, 'ItalianPottery'),
+    Region('AgentNA', 'North Africa', 7, 'NAPottery'),
+    Region('AgentTarr', 'Tarraconensis', 8, 'TarrPottery'),
+    Region('AgentWM', 'Western Mediterranean', 9, 'WMPottery'),
+)
+
+# Agent classes without a region of their own (Networks/*): one agent per node, holding
+# one unit of every pottery instead of goods_per_agent units of a single one.
+EXTRA_CLASSES = (
+    Region('AgentPrivate', 'Private', 11, None),
+    Region('AgentState', 'State', 11, None),
+)
+
+# every agent class, model.region indexes this tuple
+AGENT_CLASSES = REGIONS + EXTRA_CLASSES
+
+# pottery prices per region (in REGIONS order)
+HISTORICAL_PRICES = (4, 6, 7, 6, 4, 4, 7, 7, 6, 5, 6)
+UNIFORM_PRICES = (1,) * len(REGIONS)
+
+
+def region_of_node(node):
+    """Return the index in REGIONS of the merchants starting on a node."""
+    if node != int(node) or not 0 <= node < len(REGIONS):
+        raise ValueError(f"No agent class is defined for node {node}")
+    return int(node)
+
+
+@functools.lru_cache(maxsize=None)
+def class_index(class_name):
+    """Return the index in AGENT_CLASSES of an agent class, by class name (e.g. 'AgentItaly') or type."""
+    for index, agent_class in enumerate(AGENT_CLASSES):
+        if class_name in (agent_class.class_name, agent_class.type):
+            return index
+    raise ValueError(f"Unknown agent class {class_name!r}")
+
+
+def node_class_function(node_classes=None):
+    """
+    Function of a node returning the index in AGENT_CLASSES of the merchants starting on it.
+
+    :param node_classes: Agent class name (or type) by node, as a dictionary, nodes it
+        lacks following region_of_node(), or as a function of the node (e.g. the region
+        mapping of a synthetic network with any number of nodes). region_of_node() if None.
+    """
+    if callable(node_classes):
+        return lambda node: class_index(node_classes(node))
+    indexes = {node: class_index(name) for node, name in (node_classes or {}).items()}
+    return lambda node: indexes[node] if node in indexes else region_of_node(node)
@@ -0,0 +1,57 @@
+import random
+
+import numpy as np
+
+
+def run_seed_sequence(seed, run_number):
+    """
+    Seed sequence of one run of a batch.
+
+    Runs are children of the master seed keyed by run number, so every run has an
+    independent stream that does not depend on which process runs it or in what order.
+
+    :param seed: int master seed, or a SeedSequence whose children the runs are (e.g.
+        the sequence of one parameter point of a sweep).
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key + (run_number,))
+    return np.random.SeedSequence(seed, spawn_key=(run_number,))
+
+
+def model_rngs(seed=None):
+    """
+    Random number generators of one model.
+
+    :param seed: int, SeedSequence or None for fresh entropy.
+    :return: (seed_sequence, rng, scalar_random): a numpy Generator for the batched
+        kernels and a random.Random for the scalar draws of meetings and trades (much
+        cheaper per call), both spawned from seed_sequence.
+    """
+    seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    vector, scalar = seed_sequence.spawn(2)
+    scalar_random = random.Random(int.from_bytes(scalar.generate_state(4).tobytes(), 'little'))
+    return seed_sequence, np.random.default_rng(vector), scalar_random
+
+
+def worker_rngs(seed_sequence, workers):
+    """
+    Generators of the worker threads of a model, one per worker, spawned from the
+    model's seed_sequence after the streams of model_rngs(). Results depend on the
+    number of workers, never on how the threads are scheduled.
+    """
+    return [np.random.default_rng(child) for child in seed_sequence.spawn(workers)]
+
+
+# spawn key tag of the per-step streams of common random numbers
+CRN_KEY = 0x63726E
+MOVEMENT, MEETING = 0, 1
+
+
+def step_seed_sequence(seed_sequence, step, phase):
+    """
+    Seed sequence of one phase (MOVEMENT or MEETING) of one step under common random
+    numbers. It depends only on the model's seed, the step and the phase, so models of
+    different scenarios seeded alike draw the same numbers in the same phase of the same
+    step, however many numbers their earlier steps used.
+    """
+    return np.random.SeedSequence(seed_sequence.entropy, spawn_key=seed_sequence.spawn_key + (CRN_KEY, step, phase))
@@ -0,0 +1,263 @@
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .behaviors import BEHAVIOR_NAMES, BEHAVIORS, behavior_code
+from .checkpoint import checkpoint_file, checkpoint_seed, load_checkpoint, save_checkpoint
+from .log import STEP, SUMMARY, configure, logger
+from .regions import AGENT_CLASSES
+from .rng import run_seed_sequence
+
+RUN_COLUMNS = ['Run', 'Step Count', 'Agent ID', 'Agent Class', 'Total Wealth', 'Trade Behavior', 'Active']
+
+
+def portable_behaviors(agent_behaviors):
+    """
+    Map a fixed_agent_behaviors dict onto the engine's behavior functions.
+
+    The dict may hold functions of an old model module (or of __main__), which cannot
+    be sent to worker processes. Behaviors are matched by name.
+    """
+    if agent_behaviors is None:
+        return None
+    return {agent_id: BEHAVIORS[behavior_code(behavior)] for agent_id, behavior in agent_behaviors.items()}
+
+
+def draw_behaviors(make_model, seed=None):
+    """Draw a behavior for every agent the way the first run of a driver does."""
+    return portable_behaviors(make_model(seed=seed).agent_behaviors)
+
+
+def run_model(make_model, run_number, agent_behaviors=None, max_steps=3000, seed=None, checkpoint_dir=None,
+              checkpoint_every=100, convergence=None, collector=None):
+    """
+    Run one replicate until no agent is active, max_steps is reached or the convergence
+    detector reports a steady state.
+
+    :param make_model: Callable returning a fresh model, called with agent_behaviors=... and seed=...
+    :param seed: Master seed of the batch, the run uses its own stream of it (see engine.rng).
+    :param checkpoint_dir: Directory of the run's checkpoint (see engine.checkpoint). The
+        run continues from its checkpoint if there is one, saves one every
+        checkpoint_every steps and a final one when it completes. A run completed at a
+        smaller max_steps continues up to this one, unless it converged or ran out of
+        active agents.
+    :param convergence: engine.convergence.ConvergenceDetector ending the run early. Its
+        state is saved with the checkpoints, so a resumed run converges at the same step.
+    :param collector: engine.collect.DataCollector recording the run step by step. For a
+        resumed run, one with a path continues the series written up to the checkpoint,
+        one in memory records from the checkpoint on.
+    :return: The final state of every agent as rows of the run output file.
+    """
+    if seed is not None:
+        seed = run_seed_sequence(seed, run_number)
+    model = make_model(agent_behaviors=agent_behaviors, seed=seed)
+    complete = converged = False
+    if convergence is not None:
+        convergence.reset(model)
+    if checkpoint_dir is not None:
+        filename = checkpoint_file(checkpoint_dir, run_number)
+        if os.path.exists(filename):
+            complete = load_checkpoint(model, filename, max_steps, convergence)
+            logger.log(SUMMARY, "Run %d resumed at step %d", run_number, model.steps)
+            if collector is not None:
+                collector.resume(model)
+    if collector is not None:
+        collector.collect(model)
+    log_steps = logger.isEnabledFor(STEP)
+    step_count = model.steps
+    while step_count < max_steps and not complete:
+        if log_steps:
+            logger.log(STEP, "Run %d, Step %d: Active Agents = %d", run_number, step_count, model.num_active)
+        if not model.num_active:
+            break
+        model.step()
+        step_count += 1
+        if collector is not None:
+            collector.collect(model)
+        if convergence is not None and convergence.converged(model):
+            logger.log(SUMMARY, "Run %d converged at step %d", run_number, step_count)
+            converged = True
+            break
+        if checkpoint_dir is not None and step_count % checkpoint_every == 0:
+            # the series written so far matches the checkpoint, see DataCollector.resume()
+            if collector is not None:
+                collector.flush()
+            save_checkpoint(model, filename, max_steps=max_steps, convergence=convergence)
+    if collector is not None:
+        collector.finish(model)
+    if checkpoint_dir is not None and not complete:
+        save_checkpoint(model, filename, complete=True, max_steps=max_steps, convergence=convergence,
+                        converged=converged)
+    logger.log(SUMMARY, "Run %d completed after %d steps", run_number, step_count)
+    return agent_rows(model, run_number, step_count)
+
+
+def agent_rows(model, run_number, step_count, agents=slice(None)):
+    """
+    The final state of every agent, one dict per agent with the columns of the run files.
+
+    :param agents: Slice of the agent rows to report, e.g. those of one replicate of a
+        model with replicates (see run_batch()).
+    """
+    goods = {name: column[agents].tolist() for name, column in model.inventory.summary().items()
+             if column[agents].any()}
+    regions = [AGENT_CLASSES[r].type for r in model.region[agents].tolist()]
+    unique_ids = model.unique_id[agents].tolist()
+    behaviors = model.behavior[agents].tolist()
+    wealth = model.wealth[agents].tolist()
+    active = model.active[agents].tolist()
+    rows = []
+    for i in range(len(unique_ids)):
+        row = {
+            'Run': run_number,
+            'Step Count': step_count,
+            'Agent ID': unique_ids[i],
+            'Agent Class': regions[i],
+            'Total Wealth': wealth[i],
+            'Trade Behavior': BEHAVIOR_NAMES[behaviors[i]],
+            'Active': active[i],
+        }
+        for name, counts in goods.items():
+            row[name] = counts[i]
+        rows.append(row)
+    return rows
+
+
+def run_batch(make_model, run_numbers, agent_behaviors=None, max_steps=3000, seed=None):
+    """
+    Run several replicates as one model with replicates=len(run_numbers) (see ArrayModel),
+    until no agent of any replicate is active or max_steps is reached.
+
+    :param make_model: Callable returning a fresh model, called with agent_behaviors=...,
+        seed=... and replicates=...
+    :param seed: Master seed of the batch, the batch uses the stream of its first run.
+    :return: List of (run_number, rows), rows as returned by run_model().
+    """
+    if seed is not None:
+        seed = run_seed_sequence(seed, run_numbers[0])
+    model = make_model(agent_behaviors=agent_behaviors, seed=seed, replicates=len(run_numbers))
+    log_steps = logger.isEnabledFor(STEP)
+    while model.steps < max_steps and model.num_active:
+        if log_steps:
+            logger.log(STEP, "Runs %d-%d, Step %d: Active Agents = %d", run_numbers[0], run_numbers[-1],
+                       model.steps, model.num_active)
+        model.step()
+    results = []
+    size = model.replicate_size
+    for r, run_number in enumerate(run_numbers):
+        step_count = int(model.replicate_steps[r])
+        logger.log(SUMMARY, "Run %d completed after %d steps", run_number, step_count)
+        results.append((run_number, agent_rows(model, run_number, step_count, slice(r * size, (r + 1) * size))))
+    return results
+
+
+def write_rows_csv(path, rows):
+    """Write agent rows to a CSV file in the format of the run scripts."""
+    fieldnames = list(rows[0]) if rows else RUN_COLUMNS
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+_worker_make_model = None
+
+
+def _init_worker(make_model, log_level):
+    # the model factory (graphs included) is sent once per worker, not once per run
+    global _worker_make_model
+    _worker_make_model = make_model
+    if log_level is not None:
+        configure(log_level)
+
+
+def _run_in_worker(run_number, agent_behaviors, max_steps, seed, checkpoint_dir, checkpoint_every, convergence,
+                   make_collector):
+    collector = make_collector(run_number) if make_collector is not None else None
+    return run_number, run_model(_worker_make_model, run_number, agent_behaviors, max_steps, seed,
+                                 checkpoint_dir, checkpoint_every, convergence, collector)
+
+
+def _run_batch_in_worker(run_numbers, agent_behaviors, max_steps, seed):
+    return run_batch(_worker_make_model, run_numbers, agent_behaviors, max_steps, seed)
+
+
+def run_replicates(make_model, num_runs, fixed_agent_behaviors=None, processes=None, max_steps=3000,
+                   first_run=1, seed=None, log_level=None, checkpoint_dir=None, checkpoint_every=100,
+                   skip_runs=(), convergence=None, make_collector=None, batch_size=None):
+    """
+    Run replicates on a process pool, yielding (run_number, rows) as runs complete.
+
+    All runs share one behavior assignment, like the sequential drivers where the first
+    run draws the behaviors and later runs reuse them.
+
+    :param make_model: Picklable callable returning a fresh model, e.g.
+        functools.partial(ArrayModel, G, agents_per_node, incoming, outgoing).
+    :param num_runs: Number of replicates.
+    :param fixed_agent_behaviors: Dictionary of agent behaviors, drawn once if not given.
+    :param processes: Worker processes, all cores by default. 1 runs in this process.
+    :param first_run: Number of the first run.
+    :param seed: Master seed. The same seed gives bit-identical runs whatever the number
+        of processes, fresh entropy if None.
+    :param log_level: engine.log level ('off', 'summary', ...) to configure in the worker
+        processes (or in this process when processes is 1).
+    :param checkpoint_dir: Directory of checkpoints to save and resume from, see
+        run_model(). The master seed is saved there too, so a batch resumed without a
+        seed continues with the seed it started with.
+    :param checkpoint_every: Steps between the checkpoints of a run.
+    :param skip_runs: Run numbers not to run, e.g. those whose output was already written.
+    :param convergence: engine.convergence.ConvergenceDetector ending runs early, see run_model().
+    :param make_collector: Picklable callable returning the DataCollector of a run from
+        its run number. Collectors of worker processes stay there, so give them a path,
+        e.g. lambda run: DataCollector(interval=10, path=f'Runs/series/run_{run}') with
+        processes=1, or a functools.partial of a module-level function otherwise.
+    :param batch_size: Simulate the runs in batches of batch_size replicates, each batch
+        one model advancing all its replicates together (see run_batch()). Results then
+        depend on batch_size, not on the number of processes. Batches do not support
+        checkpoints, convergence detection or collectors.
+    """
+    if batch_size is not None and (checkpoint_dir is not None or convergence is not None or
+                                   make_collector is not None):
+        raise ValueError("Batched runs do not support checkpoints, convergence detection or collectors")
+    if checkpoint_dir is not None:
+        seed = checkpoint_seed(checkpoint_dir, seed)
+    elif seed is None:
+        seed = np.random.SeedSequence().entropy
+    if fixed_agent_behaviors is None:
+        # drawn from the first run's stream, like the first run of a sequential driver
+        fixed_agent_behaviors = draw_behaviors(make_model, run_seed_sequence(seed, first_run))
+    agent_behaviors = portable_behaviors(fixed_agent_behaviors)
+    run_numbers = [run_number for run_number in range(first_run, first_run + num_runs) if run_number not in skip_runs]
+    batches = None
+    if batch_size is not None:
+        batches = [run_numbers[start:start + batch_size] for start in range(0, len(run_numbers), batch_size)]
+
+    if processes == 1:
+        if log_level is not None:
+            configure(log_level)
+        if batches is not None:
+            for batch in batches:
+                yield from run_batch(make_model, batch, agent_behaviors, max_steps, seed)
+            return
+        for run_number in run_numbers:
+            collector = make_collector(run_number) if make_collector is not None else None
+            yield run_number, run_model(make_model, run_number, agent_behaviors, max_steps, seed,
+                                        checkpoint_dir, checkpoint_every, convergence, collector)
+        return
+
+    processes = min(processes or os.cpu_count() or 1, len(batches or run_numbers)) or 1
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(make_model, log_level)) as executor:
+        if batches is not None:
+            futures = [executor.submit(_run_batch_in_worker, batch, agent_behaviors, max_steps, seed)
+                       for batch in batches]
+            for future in as_completed(futures):
+                yield from future.result()
+            return
+        futures = [executor.submit(_run_in_worker, run_number, agent_behaviors, max_steps, seed,
+                                   checkpoint_dir, checkpoint_every, convergence, make_collector)
+                   for run_number in run_numbers]
+        for future in as_completed(futures):
+            yield future.result()
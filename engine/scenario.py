@@ -0,0 +1,325 @@
+"""
+Scenarios as declarative configs run on ArrayModel.
+
+Every scenario directory holds a scenario.json describing how its model differs from
+the others: network files, prices, movement and meeting rules, customs per agent class,
+transaction costs, extra agent types and the output files of its run script. The keys
+and their defaults are in DEFAULTS; file paths are relative to the repository root,
+except the output files, which are relative to the scenario directory like the Runs/
+folder of the run scripts.
+
+    python -m engine.scenario Historical_Protectionism --runs 10 --seed 20250214
+"""
+import argparse
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import ReplicateAggregator
+from .collect import DataCollector
+from .convergence import make_detector
+from .log import LEVELS, SUMMARY, configure, logger
+from .model import ArrayModel
+from .netcache import load_compiled
+from .network import load_network
+from .regions import AGENT_CLASSES, HISTORICAL_PRICES, REGIONS, UNIFORM_PRICES, class_index
+from .runner import run_replicates, write_rows_csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIO_FILE = 'scenario.json'
+
+# customs terms an agent class pays, as (incoming, outgoing) factors
+CUSTOMS_MODES = {'both': (1, 1), 'incoming': (1, 0), 'outgoing': (0, 1), 'none': (0, 0)}
+
+DEFAULTS = {
+    'notes': '',
+    # transport graph, and customs graphs by name ('incoming', 'outgoing')
+    'network': None,
+    'customs_networks': {},
+    # agents on every node of the REGIONS order (an int) or by node
+    'agents_per_node': 10,
+    # agent class by node where it differs from the REGIONS order
+    'node_classes': {},
+    # class of one more agent per node holding one unit of every pottery, e.g. 'AgentPrivate'
+    'extra_agent': None,
+    # 'historical', 'uniform', a list in REGIONS order or prices by class with a 'default'
+    'prices': 'historical',
+    'wealth': 500,
+    'goods_per_agent': 10,
+    # 'cheapest', 'cheapest_by_value' or 'random', see ArrayModel
+    'movement': 'cheapest',
+    # whether customs enter the move cost, and the customs of every class: a CUSTOMS_MODES
+    # name, one factor for both customs or an [incoming, outgoing] pair of factors
+    'customs': {'charged': False, 'default': 'both', 'classes': {}},
+    # 'greedy' or 'shuffle', see ArrayModel
+    'meeting': 'greedy',
+    'meeting_sample_size': 5,
+    # 'sequential' or 'batched' trade settlement, see ArrayModel
+    'trading': 'sequential',
+    # 'numpy' or 'jit' (compiled kernels, needs numba), see ArrayModel
+    'backend': 'numpy',
+    # threads of the meeting phase with the 'jit' backend, see ArrayModel
+    'workers': 1,
+    # restart the random streams every step for paired comparisons, see engine.compare
+    'common_random_numbers': False,
+    # pair cost by type: same_type / different_type, pairs overrides [class, class, cost]
+    'transaction_cost': {'same_type': 0, 'different_type': 1, 'pairs': []},
+    'max_steps': 1000,
+    # record the nodes every agent moves to: true, false or the number of last steps to keep
+    'movement_history': False,
+    # steady state ending runs early, see engine.convergence.make_detector(), e.g.
+    # {'type': 'distribution', 'epsilon': 0.001, 'window': 50}
+    'convergence': None,
+    'num_runs': 10,
+    # output files of the run script, runs with a {run} field
+    'output': {
+        'runs': 'Runs/agents_run_{run}.csv',
+        'id_averages': 'Runs/agents_id_averages.csv',
+        'class_averages': 'Runs/agents_class_averages.csv',
+    },
+}
+
+
+def _customs_factors(mode):
+    if isinstance(mode, str):
+        return CUSTOMS_MODES[mode]
+    if isinstance(mode, (int, float)):
+        return (mode, mode)
+    incoming, outgoing = mode
+    return (incoming, outgoing)
+
+
+class Scenario:
+    """One scenario config, with the ArrayModel arguments it translates to."""
+
+    def __init__(self, config, directory=ROOT, name=None):
+        """
+        :param config: Dictionary of scenario settings, see DEFAULTS.
+        :param directory: Directory of the scenario, the output files are relative to it.
+        :param name: Name of the scenario, the directory relative to the repository root by default.
+        """
+        unknown = set(config) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown scenario settings: {', '.join(sorted(unknown))}")
+        self.config = {**DEFAULTS, **config}
+        for key in ('customs', 'transaction_cost', 'output'):
+            self.config[key] = {**DEFAULTS[key], **config.get(key, {})}
+        self.directory = directory
+        self.name = name or os.path.relpath(directory, ROOT)
+
+    def __repr__(self):
+        return f"Scenario({self.name!r})"
+
+    def __getitem__(self, key):
+        return self.config[key]
+
+    def prices(self):
+        """Pottery prices in REGIONS order."""
+        prices = self['prices']
+        if prices == 'historical':
+            return HISTORICAL_PRICES
+        if prices == 'uniform':
+            return UNIFORM_PRICES
+        if isinstance(prices, dict):
+            by_class = {class_index(name): price for name, price in prices.items() if name != 'default'}
+            return tuple(by_class.get(r, prices.get('default')) for r in range(len(REGIONS)))
+        if len(prices) != len(REGIONS):
+            raise ValueError(f"Expected {len(REGIONS)} prices, got {len(prices)}")
+        return tuple(prices)
+
+    def prices_by_class(self):
+        """Pottery prices by agent class name."""
+        return {region.class_name: price for region, price in zip(REGIONS, self.prices())}
+
+    def agents_per_node(self):
+        agents = self['agents_per_node']
+        if isinstance(agents, int):
+            return {node: agents for node in range(len(REGIONS))}
+        return {int(node): count for node, count in agents.items()}
+
+    def customs_factors(self):
+        """(incoming, outgoing) customs factors by agent class name."""
+        customs = self['customs']
+        factors = {'default': _customs_factors(customs['default'])}
+        for name, mode in customs['classes'].items():
+            factors[AGENT_CLASSES[class_index(name)].class_name] = _customs_factors(mode)
+        return factors
+
+    def transaction_costs(self):
+        """Pair cost table indexed by the type_ids of both agents."""
+        costs = self['transaction_cost']
+        num_types = max(agent_class.type_id for agent_class in AGENT_CLASSES) + 1
+        table = np.full((num_types, num_types), costs['different_type'])
+        np.fill_diagonal(table, costs['same_type'])
+        for first, second, cost in costs['pairs']:
+            a, b = (AGENT_CLASSES[class_index(name)].type_id for name in (first, second))
+            table[a, b] = table[b, a] = cost
+        return table
+
+    def model_kwargs(self):
+        """ArrayModel keyword arguments of the scenario, except the graphs."""
+        return {
+            'prices': self.prices(),
+            'wealth': self['wealth'],
+            'goods_per_agent': self['goods_per_agent'],
+            'customs_in_cost': self['customs']['charged'],
+            'customs_factors': self.customs_factors(),
+            'movement': self['movement'],
+            'meeting': self['meeting'],
+            'meeting_sample_size': self['meeting_sample_size'],
+            'trading': self['trading'],
+            'backend': self['backend'],
+            'workers': self['workers'],
+            'common_random_numbers': self['common_random_numbers'],
+            'transaction_costs': self.transaction_costs(),
+            'node_classes': {int(node): name for node, name in self['node_classes'].items()},
+            'extra_agent': self['extra_agent'],
+            'movement_history': self['movement_history'],
+        }
+
+    def _customs_files(self):
+        unknown = set(self['customs_networks']) - {'incoming', 'outgoing'}
+        if unknown:
+            raise ValueError(f"Unknown customs networks: {', '.join(sorted(unknown))}")
+        return {name: os.path.join(ROOT, filename) for name, filename in self['customs_networks'].items()}
+
+    def load_networks(self):
+        """Return (G, incoming_customs_network, outgoing_customs_network), None for a missing customs graph."""
+        customs = {name: load_network(filename) for name, filename in self._customs_files().items()}
+        return load_network(os.path.join(ROOT, self['network'])), customs.get('incoming'), customs.get('outgoing')
+
+    def compiled_network(self, cache_dir=None):
+        """CompiledNetwork of the scenario's networks, from the network cache (see engine.netcache)."""
+        return load_compiled(os.path.join(ROOT, self['network']), cache_dir, **self._customs_files())
+
+    def model_factory(self):
+        """
+        Picklable callable returning a fresh model of the scenario, for run_model() and
+        run_replicates(). The networks are compiled once and cached; the factory carries
+        the cached network, which worker processes memory-map.
+        """
+        return functools.partial(ArrayModel, None, self.agents_per_node(), network=self.compiled_network(),
+                                 **self.model_kwargs())
+
+    def output_path(self, key, **fields):
+        return os.path.join(self.directory, self['output'][key].format(**fields))
+
+    def run(self, num_runs=None, processes=None, seed=None, max_steps=None, checkpoint_dir=None,
+            checkpoint_every=100, resume=False, series_interval=None, batch_size=None, log_level=None):
+        """
+        Run the replicates of the scenario and write the files of its run script.
+
+        :param num_runs: Number of runs, the scenario's num_runs by default.
+        :param processes: Worker processes, see run_replicates().
+        :param seed: Master seed, fresh entropy if None.
+        :param max_steps: Step limit of every run, the scenario's max_steps by default.
+        :param checkpoint_dir: Directory to checkpoint the runs in every checkpoint_every
+            steps, relative to the scenario directory (see run_replicates()).
+        :param resume: Skip the runs whose output file exists (their rows are read back
+            for the averages) and continue the others from their checkpoints.
+        :param series_interval: Also record the default time series of every run every
+            series_interval steps, to Runs/series/run_<run> of the scenario directory
+            (see engine.collect).
+        :param batch_size: Simulate the runs in batches of batch_size replicates advancing
+            together, see run_replicates().
+        :param log_level: engine.log level to configure in the worker processes, see
+            run_replicates(). The progress of the batch is logged at the SUMMARY level.
+        :return: The ReplicateAggregator of the runs.
+        """
+        make_model = self.model_factory()
+        num_runs = num_runs or self['num_runs']
+        aggregator = ReplicateAggregator()
+        done = []
+        if resume:
+            done = [run for run in range(1, num_runs + 1) if os.path.exists(self.output_path('runs', run=run))]
+            for run in done:
+                aggregator.update(pd.read_csv(self.output_path('runs', run=run)).to_dict('records'))
+            logger.log(SUMMARY, "Resuming, %d of %d runs already completed.", len(done), num_runs)
+        if checkpoint_dir is not None:
+            checkpoint_dir = os.path.join(self.directory, checkpoint_dir)
+        make_collector = None
+        if series_interval is not None:
+            make_collector = functools.partial(_series_collector, os.path.join(self.directory, 'Runs', 'series'),
+                                               series_interval)
+        for run, rows in run_replicates(make_model, num_runs, processes=processes, seed=seed,
+                                        max_steps=max_steps or self['max_steps'], checkpoint_dir=checkpoint_dir,
+                                        checkpoint_every=checkpoint_every, skip_runs=done,
+                                        convergence=make_detector(self['convergence']),
+                                        make_collector=make_collector, batch_size=batch_size,
+                                        log_level=log_level):
+            output_filename = self.output_path('runs', run=run)
+            os.makedirs(os.path.dirname(output_filename), exist_ok=True)
+            write_rows_csv(output_filename, rows)
+            aggregator.update(rows)
+            logger.log(SUMMARY, "Run %d completed. Results saved to: %s", run, output_filename)
+
+        id_average_output_file = self.output_path('id_averages')
+        class_average_output_file = self.output_path('class_averages')
+        aggregator.write(id_average_output_file, class_average_output_file)
+        logger.log(SUMMARY, "Averages by Agent ID saved to: %s", id_average_output_file)
+        logger.log(SUMMARY, "Averages by Agent Class saved to: %s", class_average_output_file)
+        return aggregator
+
+
+def _series_collector(directory, interval, run_number):
+    return DataCollector(interval=interval, path=os.path.join(directory, f'run_{run_number}'))
+
+
+def scenario_names(root=ROOT):
+    """Names of the scenarios of the repository (directories with a scenario.json)."""
+    names = []
+    for directory, _, files in os.walk(root):
+        if SCENARIO_FILE in files:
+            names.append(os.path.relpath(directory, root).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def load_scenario(name):
+    """
+    Load a scenario.
+
+    :param name: Scenario directory relative to the repository root (e.g. 'Price/Extremes'),
+        or a path to a scenario directory or JSON file.
+    """
+    path = name if os.path.exists(name) else os.path.join(ROOT, name)
+    if os.path.isdir(path):
+        path = os.path.join(path, SCENARIO_FILE)
+    with open(path, 'r', encoding='utf-8') as file:
+        config = json.load(file)
+    directory = os.path.dirname(os.path.abspath(path))
+    return Scenario(config, directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the replicates of a scenario.")
+    parser.add_argument('scenario', nargs='?', help="scenario directory, e.g. Price/Extremes")
+    parser.add_argument('--runs', type=int, help="number of runs (default: the scenario's num_runs)")
+    parser.add_argument('--processes', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, help="master seed (default: fresh entropy)")
+    parser.add_argument('--max-steps', type=int, help="step limit of every run")
+    parser.add_argument('--checkpoint-dir', help="checkpoint directory, relative to the scenario directory")
+    parser.add_argument('--checkpoint-every', type=int, default=100, help="steps between checkpoints (default: 100)")
+    parser.add_argument('--resume', action='store_true',
+                        help="skip the runs already saved and continue the others from their checkpoints")
+    parser.add_argument('--series', type=int, metavar='INTERVAL',
+                        help="record the time series of every run every INTERVAL steps to Runs/series")
+    parser.add_argument('--batch-size', type=int,
+                        help="simulate the runs in batches of this many replicates advancing together")
+    parser.add_argument('--log-level', choices=list(LEVELS), default='summary',
+                        help="engine log level (default: summary, one line per run)")
+    parser.add_argument('--list', action='store_true', help="list the scenarios and exit")
+    args = parser.parse_args(argv)
+    if args.list or args.scenario is None:
+        print('\n'.join(scenario_names()))
+        return
+    configure(args.log_level)
+    load_scenario(args.scenario).run(args.runs, args.processes, args.seed, args.max_steps, args.checkpoint_dir,
+                                     args.checkpoint_every, args.resume, args.series, args.batch_size,
+                                     args.log_level)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Parameter sweeps over scenario settings.
+
+A sweep takes one scenario and a list of parameter points, each point a dict of
+scenario settings by dotted path:
+
+    {'customs.classes.AgentItaly': 'outgoing', 'transaction_cost.different_type': 50}
+
+Paths reach into prices ('prices.AgentItaly'), customs factors ('customs.default',
+'customs.classes.AgentItaly', a CUSTOMS_MODES name or factors), agents_per_node (an int,
+or 'agents_per_node.3' for one node), transaction costs and max_steps. grid() and
+latin_hypercube() build the points; run_sweep() runs every (point, replicate) job on a
+process pool and writes one SweepDataset.
+
+    python -m engine.sweep sweep.json --processes 8 --seed 1
+"""
+import argparse
+import copy
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .convergence import make_detector
+from .log import LEVELS, SUMMARY, configure, logger
+from .output import SweepDataset
+from .rng import run_seed_sequence
+from .runner import draw_behaviors, run_model
+from .scenario import Scenario, load_scenario
+
+
+def grid(axes):
+    """
+    Full factorial grid.
+
+    :param axes: Dictionary of the values of every parameter, by dotted path.
+    :return: List of points, the last parameter varying fastest.
+    """
+    paths = list(axes)
+    return [dict(zip(paths, values)) for values in itertools.product(*(axes[path] for path in paths))]
+
+
+def latin_hypercube(ranges, num_points, seed=None):
+    """
+    Latin hypercube sample: every parameter takes one value from each of num_points
+    equal strata of its range, the strata of different parameters paired at random.
+
+    :param ranges: Dictionary by dotted path of {'low': ..., 'high': ...} (integers if both
+        bounds are integers, high included) or of a list of choices.
+    :param num_points: Number of points.
+    :param seed: Seed of the sample.
+    """
+    rng = np.random.default_rng(seed)
+    points = [{} for _ in range(num_points)]
+    for path, bounds in ranges.items():
+        u = (rng.permutation(num_points) + rng.random(num_points)) / num_points
+        if isinstance(bounds, dict):
+            low, high = bounds['low'], bounds['high']
+            if isinstance(low, int) and isinstance(high, int):
+                values = [low + int(x * (high - low + 1)) for x in u]
+            else:
+                values = [low + float(x) * (high - low) for x in u]
+        else:
+            values = [bounds[int(x * len(bounds))] for x in u]
+        for point, value in zip(points, values):
+            point[path] = value
+    return points
+
+
+def apply_point(scenario, point):
+    """Return the scenario with the settings of one point."""
+    config = copy.deepcopy(scenario.config)
+    for path, value in point.items():
+        keys = path.split('.')
+        if keys[0] not in config:
+            raise ValueError(f"Unknown scenario setting: {path}")
+        target = config
+        for key in keys[:-1]:
+            if key == 'prices' and not isinstance(target[key], dict):
+                target[key] = scenario.prices_by_class()
+            elif key == 'agents_per_node' and not isinstance(target[key], dict):
+                target[key] = {str(node): count for node, count in scenario.agents_per_node().items()}
+            target = target.setdefault(key, {})
+        target[keys[-1]] = value
+    return Scenario(config, scenario.directory, scenario.name)
+
+
+def point_seed_sequence(seed, point):
+    """Seed sequence of one point of a sweep; its runs are children of it (see run_seed_sequence)."""
+    return np.random.SeedSequence(seed, spawn_key=(point,))
+
+
+_worker_scenario = None
+_worker_points = None
+_worker_paired = False
+_worker_models = {}
+
+
+def _init_worker(scenario, points, paired=False, log_level=None):
+    global _worker_scenario, _worker_points, _worker_paired
+    _worker_scenario, _worker_points, _worker_paired = scenario, points, paired
+    _worker_models.clear()
+    if log_level is not None:
+        configure(log_level)
+
+
+def _seed_sequence(seed, point):
+    # paired points share the seed sequence of point 0
+    return point_seed_sequence(seed, 0 if _worker_paired else point)
+
+
+def _point_model(point, seed):
+    # networks are read and behaviors drawn once per point and worker
+    if point not in _worker_models:
+        scenario = apply_point(_worker_scenario, _worker_points[point])
+        make_model = scenario.model_factory()
+        behaviors = draw_behaviors(make_model, run_seed_sequence(_seed_sequence(seed, point), 1))
+        _worker_models[point] = (make_model, behaviors, scenario['max_steps'], make_detector(scenario['convergence']))
+    return _worker_models[point]
+
+
+def _run_job(point, run_number, seed, max_steps):
+    make_model, behaviors, point_max_steps, convergence = _point_model(point, seed)
+    rows = run_model(make_model, run_number, behaviors, max_steps or point_max_steps,
+                     _seed_sequence(seed, point), convergence=convergence)
+    return point, run_number, rows
+
+
+def run_sweep(scenario, points, path, num_runs=None, processes=None, seed=None, max_steps=None,
+              common_random_numbers=False, log_level=None):
+    """
+    Run num_runs replicates of every point on a process pool.
+
+    Jobs are (point, run) pairs, queued point by point and handed to the workers as
+    they free up, so points of different cost share the pool. Every point draws its own
+    agent behaviors, shared by its runs like in run_replicates(), and every run has its
+    own stream of the master seed, so results do not depend on the pool.
+
+    :param scenario: Scenario the points modify.
+    :param points: List of points (see grid() and latin_hypercube()).
+    :param path: Directory of the SweepDataset.
+    :param num_runs: Replicates per point, the scenario's num_runs by default.
+    :param processes: Worker processes, all cores by default. 1 runs in this process.
+    :param seed: Master seed, fresh entropy if None.
+    :param max_steps: Step limit of every run, each point's max_steps by default.
+    :param common_random_numbers: Pair the points: run r of every point gets the same
+        seed, agents get the same behaviors at every point and the models run under
+        common random numbers (see engine.compare), so differences between points have
+        a smaller variance.
+    :param log_level: engine.log level to configure in the worker processes (or in this
+        process when processes is 1). Every completed job is logged at the SUMMARY level.
+    :return: The SweepDataset.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    if common_random_numbers:
+        scenario = apply_point(scenario, {'common_random_numbers': True})
+    num_runs = num_runs or scenario['num_runs']
+    dataset = SweepDataset(path, points)
+    jobs = [(point, run_number) for point in range(len(points)) for run_number in range(1, num_runs + 1)]
+
+    if processes == 1:
+        _init_worker(scenario, points, common_random_numbers, log_level)
+        for point, run_number in jobs:
+            dataset.write_run(*_run_job(point, run_number, seed, max_steps))
+            logger.log(SUMMARY, "Point %d run %d completed.", point, run_number)
+        return dataset
+
+    processes = min(processes or os.cpu_count() or 1, len(jobs)) or 1
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(scenario, points, common_random_numbers, log_level)) as executor:
+        futures = [executor.submit(_run_job, point, run_number, seed, max_steps) for point, run_number in jobs]
+        for future in as_completed(futures):
+            point, run_number, rows = future.result()
+            dataset.write_run(point, run_number, rows)
+            logger.log(SUMMARY, "Point %d run %d completed.", point, run_number)
+    return dataset
+
+
+def load_sweep(filename):
+    """
+    Load a sweep file: a JSON object with the scenario, the points and the output.
+
+        {"scenario": "TransactionCost/Extremes",
+         "grid": {"transaction_cost.different_type": [1, 5, 50]},
+         "num_runs": 10,
+         "output": "Sweeps/transaction_cost"}
+
+    "latin_hypercube": {"num_points": 20, "seed": 1, "ranges": {...}} replaces "grid".
+    The output directory is relative to the sweep file. "common_random_numbers": true
+    pairs the points, see run_sweep().
+
+    :return: (scenario, points, output_path, num_runs, common_random_numbers)
+    """
+    with open(filename, 'r', encoding='utf-8') as file:
+        spec = json.load(file)
+    scenario = load_scenario(spec['scenario'])
+    if 'grid' in spec:
+        points = grid(spec['grid'])
+    else:
+        sample = spec['latin_hypercube']
+        points = latin_hypercube(sample['ranges'], sample['num_points'], sample.get('seed'))
+    output = os.path.join(os.path.dirname(os.path.abspath(filename)), spec['output'])
+    return scenario, points, output, spec.get('num_runs'), spec.get('common_random_numbers', False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a parameter sweep of a scenario.")
+    parser.add_argument('sweep', help="sweep file (JSON)")
+    parser.add_argument('--runs', type=int, help="replicates per point (default: the sweep's num_runs)")
+    parser.add_argument('--processes', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--seed', type=int, help="master seed (default: fresh entropy)")
+    parser.add_argument('--max-steps', type=int, help="step limit of every run")
+    parser.add_argument('--common-random-numbers', action='store_true',
+                        help="pair the points under common random numbers (see engine.compare)")
+    parser.add_argument('--log-level', choices=list(LEVELS), default='summary',
+                        help="engine log level (default: summary, one line per job)")
+    args = parser.parse_args(argv)
+    configure(args.log_level)
+    scenario, points, output, num_runs, paired = load_sweep(args.sweep)
+    dataset = run_sweep(scenario, points, output, args.runs or num_runs, args.processes, args.seed, args.max_steps,
+                        paired or args.common_random_numbers, args.log_level)
+    print(f"{len(points)} points saved to: {dataset.path}")
+
+
+if __name__ == '__main__':
+    main()
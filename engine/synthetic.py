@@ -0,0 +1,249 @@
+"""
+Synthetic port networks for scaling experiments.
+
+A synthetic network is a connected transport graph of any number of nodes, its nodes
+grouped into any number of regions, with the matching incoming and outgoing customs
+graphs. Three topologies:
+
+- 'geometric': ports scattered over the unit square, linked when closer than a radius;
+- 'small_world': ports on a ring linked to their nearest neighbors, a fraction of the
+  links rewired to random ports (Watts-Strogatz);
+- 'hub_and_spoke': a complete graph of hub ports, every other port linked to its
+  nearest hub only.
+
+Transport costs are 100 x the distance between the ports (about the range of the days
+network). Regions are the Voronoi cells of randomly chosen ports; every region has a
+customs rate, which an edge between two regions carries in the customs graphs, like the
+shipped customs networks. There are only the 11 pottery regions of REGIONS, so regions
+take their agent classes from them round robin unless other classes are given.
+
+    python -m engine.synthetic geometric 10000 --regions 50 --output Synthetic/geometric_10k
+
+writes the three networks as ;-separated edge lists and a scenario.json running them
+(python -m engine.scenario Synthetic/geometric_10k).
+"""
+import argparse
+import json
+import os
+from collections import namedtuple
+
+import networkx as nx
+import numpy as np
+
+from .regions import REGIONS
+from .scenario import ROOT, SCENARIO_FILE
+
+TOPOLOGIES = ('geometric', 'small_world', 'hub_and_spoke')
+
+SyntheticNetwork = namedtuple('SyntheticNetwork', ['G', 'incoming', 'outgoing', 'node_region', 'node_classes'])
+
+
+def geometric_edges(position, radius):
+    """
+    Pairs (i, j), i < j, of the points of a (n, 2) array closer than radius.
+
+    Points are bucketed into square cells of side radius, so only the points of
+    neighboring cells are compared.
+    """
+    num_cells = max(1, int(np.ceil(1 / radius)))
+    cells = np.minimum((position // radius).astype(np.int64), num_cells - 1)
+    cell = cells[:, 0] * num_cells + cells[:, 1]
+    order = np.argsort(cell, kind='stable')
+    starts = np.searchsorted(cell[order], np.arange(num_cells * num_cells + 1))
+    pairs = []
+    # every pair of neighboring cells once: the cell itself and four of its neighbors
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        x, y = cells[order, 0] + dx, cells[order, 1] + dy
+        inside = (x < num_cells) & (y >= 0) & (y < num_cells)
+        rank = np.flatnonzero(inside)
+        neighbor = x[rank] * num_cells + y[rank]
+        counts = starts[neighbor + 1] - starts[neighbor]
+        first = np.repeat(rank, counts)
+        second = np.repeat(starts[neighbor] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        if dx == dy == 0:
+            keep = second > first
+            first, second = first[keep], second[keep]
+        a, b = order[first], order[second]
+        close = np.hypot(*(position[a] - position[b]).T) < radius
+        pairs.append(np.column_stack([np.minimum(a, b), np.maximum(a, b)])[close])
+    return np.concatenate(pairs)
+
+
+def nearest_point(points, centers, chunk=4096):
+    """Index of the nearest center of every point, in chunks of points to bound memory."""
+    result = np.empty(len(points), dtype=np.int64)
+    for start in range(0, len(points), chunk):
+        block = points[start:start + chunk]
+        distance = ((block[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        result[start:start + chunk] = distance.argmin(axis=1)
+    return result
+
+
+def _graph(num_nodes, edges, weights):
+    """Graph with nodes numbered 0.0, 1.0, ... like the CSV networks."""
+    graph = nx.Graph()
+    graph.add_nodes_from(float(node) for node in range(num_nodes))
+    graph.add_weighted_edges_from(zip(map(float, edges[:, 0]), map(float, edges[:, 1]), map(float, weights)))
+    return graph
+
+
+def _distance(position, edges):
+    return np.hypot(*(position[edges[:, 0]] - position[edges[:, 1]]).T)
+
+
+def geometric_graph(num_nodes, rng):
+    """
+    Connected random geometric graph on the unit square, and the port positions. The
+    radius starts where such graphs are almost always connected and grows until this one is.
+    """
+    position = rng.random((num_nodes, 2))
+    radius = 1.2 * np.sqrt(np.log(max(num_nodes, 2)) / (np.pi * num_nodes))
+    while True:
+        edges = geometric_edges(position, radius)
+        graph = _graph(num_nodes, edges, 100 * _distance(position, edges))
+        if nx.is_connected(graph):
+            return graph, position
+        radius *= 1.1
+
+
+def small_world_graph(num_nodes, rng, neighbors=4, rewiring=0.1):
+    """
+    Connected Watts-Strogatz graph with its ports on a circle of diameter 1, and the
+    port positions.
+
+    :param neighbors: Nearest ring neighbors every port is linked to.
+    :param rewiring: Probability of rewiring a link to a random port.
+    """
+    ring = nx.connected_watts_strogatz_graph(num_nodes, neighbors, rewiring, tries=100,
+                                             seed=int(rng.integers(2**32)))
+    angle = 2 * np.pi * np.arange(num_nodes) / num_nodes
+    position = 0.5 + 0.5 * np.column_stack([np.cos(angle), np.sin(angle)])
+    edges = np.array(ring.edges, dtype=np.int64).reshape(-1, 2)
+    return _graph(num_nodes, edges, 100 * _distance(position, edges)), position
+
+
+def hub_and_spoke_graph(num_nodes, rng, num_hubs=None, hub_discount=0.5):
+    """
+    Hub ports forming a complete graph, every other port linked to its nearest hub, on
+    the unit square, and the port positions.
+
+    :param num_hubs: Number of hubs, about the square root of num_nodes by default.
+    :param hub_discount: Factor on the transport cost between hubs (bulk shipping lanes).
+    """
+    num_hubs = min(num_nodes, num_hubs or max(2, round(np.sqrt(num_nodes))))
+    position = rng.random((num_nodes, 2))
+    hubs = np.arange(num_hubs)
+    first, second = np.triu_indices(num_hubs, k=1)
+    spokes = np.arange(num_hubs, num_nodes)
+    nearest = nearest_point(position[spokes], position[hubs])
+    edges = np.concatenate([np.column_stack([first, second]), np.column_stack([nearest, spokes])])
+    weights = 100 * _distance(position, edges)
+    weights[:len(first)] *= hub_discount
+    return _graph(num_nodes, edges, weights), position
+
+
+GENERATORS = {'geometric': geometric_graph, 'small_world': small_world_graph, 'hub_and_spoke': hub_and_spoke_graph}
+
+
+def region_classes(num_regions, classes=None):
+    """Agent class name of every region: the given class names, or REGIONS, round robin."""
+    classes = classes or [region.class_name for region in REGIONS]
+    return [classes[r % len(classes)] for r in range(num_regions)]
+
+
+def customs_graphs(graph, node_region, rates):
+    """
+    Incoming and outgoing customs graphs of a transport graph: an edge between two
+    regions carries the customs rate of the region it enters (incoming) or leaves
+    (outgoing), taken in the direction the edge is listed in; edges within a region 0.
+    The graphs are undirected like the shipped ones, so an edge has one value each.
+    """
+    incoming, outgoing = nx.Graph(), nx.Graph()
+    for source, target in graph.edges:
+        a, b = node_region[int(source)], node_region[int(target)]
+        incoming.add_edge(source, target, weight=float(rates[b]) if a != b else 0.0)
+        outgoing.add_edge(source, target, weight=float(rates[a]) if a != b else 0.0)
+    return incoming, outgoing
+
+
+def synthetic_network(topology, num_nodes, num_regions=len(REGIONS), seed=0, classes=None,
+                      customs_range=(0.02, 0.05), **options):
+    """
+    Generate a synthetic transport network with its customs networks and regions.
+
+    :param topology: One of TOPOLOGIES.
+    :param num_nodes: Number of ports.
+    :param num_regions: Number of regions (at most num_nodes), each the ports nearest to
+        one randomly chosen port.
+    :param seed: Seed of the network, the same seed gives the same network.
+    :param classes: Agent class names the regions take round robin, REGIONS by default.
+    :param customs_range: Range the customs rate of every region is drawn from uniformly
+        (the shipped customs networks use 0.02 to 0.05).
+    :param options: Settings of the topology's generator, e.g. neighbors=6 for 'small_world'
+        or num_hubs=20 for 'hub_and_spoke'.
+    :return: SyntheticNetwork of G, incoming and outgoing customs graphs, node_region (the
+        region number of every node code) and node_classes (agent class name by node, for
+        ArrayModel(node_classes=...)).
+    """
+    if topology not in GENERATORS:
+        raise ValueError(f"Unknown topology {topology!r}, expected one of {TOPOLOGIES}")
+    if not 1 <= num_regions <= num_nodes:
+        raise ValueError(f"Expected 1 to {num_nodes} regions, got {num_regions}")
+    rng = np.random.default_rng(seed)
+    G, position = GENERATORS[topology](num_nodes, rng, **options)
+    centers = rng.choice(num_nodes, num_regions, replace=False)
+    node_region = nearest_point(position, position[centers])
+    rates = rng.uniform(*customs_range, size=num_regions)
+    incoming, outgoing = customs_graphs(G, node_region, rates)
+    names = region_classes(num_regions, classes)
+    node_classes = {float(node): names[region] for node, region in enumerate(node_region)}
+    return SyntheticNetwork(G, incoming, outgoing, node_region, node_classes)
+
+
+def write_network(graph, filename):
+    """Write a graph as a ;-separated edge list (source;target;weight) without header, like the shipped CSVs."""
+    with open(filename, 'w', encoding='utf-8') as file:
+        for source, target, weight in graph.edges(data='weight'):
+            file.write(f"{int(source)};{int(target)};{weight!r}\n")
+
+
+def write_scenario(network, directory, agents_per_node=10, **settings):
+    """
+    Write the networks of a SyntheticNetwork to directory, with a scenario.json placing
+    agents_per_node merchants on every port. settings are further scenario settings.
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = {name: os.path.join(directory, f'{name}.csv')
+             for name in ('transport_network', 'incoming_customs_network', 'outgoing_customs_network')}
+    for graph, filename in zip(network[:3], files.values()):
+        write_network(graph, filename)
+    config = {
+        'notes': f"Synthetic network of {network.G.number_of_nodes()} ports in "
+                 f"{int(network.node_region.max()) + 1} regions (engine.synthetic).",
+        'network': os.path.relpath(files['transport_network'], ROOT),
+        'customs_networks': {name: os.path.relpath(files[f'{name}_customs_network'], ROOT)
+                             for name in ('incoming', 'outgoing')},
+        'agents_per_node': {int(node): agents_per_node for node in network.G.nodes},
+        'node_classes': {int(node): name for node, name in network.node_classes.items()},
+        **settings,
+    }
+    with open(os.path.join(directory, SCENARIO_FILE), 'w', encoding='utf-8') as file:
+        json.dump(config, file, indent=4)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic port network and its scenario.")
+    parser.add_argument('topology', choices=TOPOLOGIES)
+    parser.add_argument('nodes', type=int, help="number of ports")
+    parser.add_argument('--regions', type=int, default=len(REGIONS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--agents-per-node', type=int, default=10)
+    parser.add_argument('--output', required=True, help="directory to write the networks and scenario.json to")
+    args = parser.parse_args(argv)
+    network = synthetic_network(args.topology, args.nodes, args.regions, args.seed)
+    write_scenario(network, args.output, args.agents_per_node)
+    print(f"{network.G.number_of_nodes()} ports, {network.G.number_of_edges()} edges written to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
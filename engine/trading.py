@@ -0,0 +1,99 @@
+import numpy as np
+
+from .behaviors import AGGRESSIVE, CONSERVATIVE
+
+
+def trade_amounts(rng, behavior, sizes):
+    """Batched trade_amount(): goods offered by every agent, by behavior code and number of goods held."""
+    upper = np.where(behavior == AGGRESSIVE, sizes, np.where(behavior == CONSERVATIVE, 2, np.maximum(1, sizes // 2)))
+    amounts = 1 + (rng.random(len(sizes)) * upper).astype(np.int64)
+    return np.where(sizes > 0, np.minimum(amounts, sizes), 0)
+
+
+def draw_units(rng, counts):
+    """Good index of one unit drawn uniformly from every row of an (rows x goods) count matrix, rows must be non-empty."""
+    bounds = np.cumsum(counts, axis=1)
+    position = (rng.random(len(counts)) * bounds[:, -1]).astype(np.int64)
+    return (bounds <= position[:, None]).sum(axis=1)
+
+
+def cheapest_options(rng, counts, prices, num_options=3):
+    """
+    For every row of counts, draw up to num_options units without replacement and return
+    the good of the cheapest, the first drawn among equally cheap ones like min().
+    """
+    remaining = counts.copy()
+    best = np.full(len(counts), -1, dtype=np.int64)
+    best_price = np.full(len(counts), np.inf)
+    for _ in range(num_options):
+        rows = np.flatnonzero(remaining.sum(axis=1) > 0)
+        if len(rows) == 0:
+            break
+        option = draw_units(rng, remaining[rows])
+        remaining[rows, option] -= 1
+        cheaper = prices[option] < best_price[rows]
+        best[rows[cheaper]] = option[cheaper]
+        best_price[rows[cheaper]] = prices[option[cheaper]]
+    return best
+
+
+def sell_rounds(rng, sellers, buyers, offered, amounts, wealth, counts, sizes, prices):
+    """
+    Sell the offered goods of every seller to its buyer, one good per pair per round.
+
+    Round k draws the k-th good of every pair that offers more than k goods from
+    `offered` (the seller's goods when the trade started, so the goods come out as a
+    sample without replacement in draw order) and, where the buyer can pay its price and
+    holds something, swaps it for the cheapest of three of the buyer's goods. Rounds run
+    in order, so the buyer's wealth and goods seen by good k include goods 0..k-1, as in
+    the scalar _sell(). Pairs must be disjoint.
+
+    :return: Goods sold per pair.
+    """
+    sold = np.zeros(len(sellers), dtype=np.int64)
+    rows = np.flatnonzero(amounts > 0)
+    for k in range(int(amounts.max(initial=0))):
+        rows = rows[amounts[rows] > k]
+        good = draw_units(rng, offered[rows])
+        offered[rows, good] -= 1
+
+        # Ensure the buyer can afford the good and has something to give in return
+        seller, buyer = sellers[rows], buyers[rows]
+        price = prices[good]
+        ok = (wealth[buyer] >= price) & (sizes[buyer] > 0)
+        seller, buyer, good, price = seller[ok], buyer[ok], good[ok], price[ok]
+        if len(seller) == 0:
+            continue
+        option = cheapest_options(rng, counts[buyer], prices)
+
+        wealth[buyer] -= price
+        wealth[seller] += price
+        # like Inventory.remove(), a good the seller no longer holds is not taken from it
+        held = counts[seller, good] > 0
+        counts[seller[held], good[held]] -= 1
+        sizes[seller[held]] -= 1
+        counts[buyer, good] += 1
+        counts[buyer, option] -= 1
+        counts[seller, option] += 1
+        sizes[seller] += 1
+        sold[rows[ok]] += 1
+    return sold
+
+
+def settle_trades(rng, first, second, behavior, wealth, counts, sizes, prices):
+    """
+    Batched ArrayModel.trade() of many disjoint pairs (first[i], second[i]).
+
+    Both agents of every pair draw how many goods they offer by their behaviors, first
+    sells its goods to second, then second sells the goods it offered when the trade
+    started to first (see sell_rounds()). wealth, counts and sizes are updated in place.
+
+    :return: (goods first sold, goods second sold) per pair.
+    """
+    amount_first = trade_amounts(rng, behavior[first], sizes[first])
+    amount_second = trade_amounts(rng, behavior[second], sizes[second])
+    # both sides pick the goods they offer before any is handed over
+    offered_first, offered_second = counts[first], counts[second]
+    sold_first = sell_rounds(rng, first, second, offered_first, amount_first, wealth, counts, sizes, prices)
+    sold_second = sell_rounds(rng, second, first, offered_second, amount_second, wealth, counts, sizes, prices)
+    return sold_first, sold_second
@@ -0,0 +1,69 @@
+import contextlib
+import importlib.util
+import io
+import os
+import random
+import sys
+import warnings
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from engine.scenario import load_scenario  # noqa: E402
+
+REFERENCE_MODEL = os.path.join(ROOT, 'Historical_Protectionism', 'model_hist_protectionism_20250214.py')
+
+
+@pytest.fixture(scope='session')
+def scenario():
+    """The Historical_Protectionism scenario, the one TestModelINTEST implements."""
+    return load_scenario('Historical_Protectionism')
+
+
+def load_module(path):
+    """Import a model script of a scenario directory, e.g. its mesa TestModelINTEST."""
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope='session')
+def reference():
+    """The mesa model module of Historical_Protectionism, holding TestModelINTEST."""
+    return load_module(REFERENCE_MODEL)
+
+
+def final_state(model):
+    """Mean wealth and share of active agents of a model, ArrayModel or TestModelINTEST."""
+    agents = list(model.schedule.agents)
+    return np.mean([agent.wealth for agent in agents]), np.mean([agent.active for agent in agents])
+
+
+def run_reference(make_reference, runs, steps):
+    """final_state() of runs mesa models of make_reference() run steps steps, seeded 0..runs-1."""
+    results = []
+    for seed in range(runs):
+        random.seed(seed)
+        # the mesa models print every skipped trade, and mesa warns about the old Model init
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter('ignore', FutureWarning)
+            model = make_reference()
+            for _ in range(steps):
+                model.step()
+        results.append(final_state(model))
+    return np.array(results)
+
+
+def run_engine(make_model, runs, steps):
+    """final_state() of runs models of make_model (called with seed=...) after steps steps."""
+    results = []
+    for seed in range(runs):
+        model = make_model(seed=seed)
+        for _ in range(steps):
+            model.step()
+        results.append(final_state(model))
+    return np.array(results)
@@ -0,0 +1,58 @@
+import functools
+
+import numpy as np
+import pytest
+
+from engine import jit
+from engine.rng import run_seed_sequence
+from engine.runner import agent_rows, draw_behaviors, run_batch
+
+SEED = 7
+REPLICATES = 4
+MAX_STEPS = 3000
+
+
+def frozen_rows(make_model, behaviors, run_numbers):
+    """
+    Step a batch by hand and keep the rows of every replicate at the step it ran out of
+    active agents (or at MAX_STEPS), the final state a lone run of it would report.
+    """
+    model = make_model(agent_behaviors=behaviors, seed=run_seed_sequence(SEED, run_numbers[0]),
+                       replicates=len(run_numbers))
+    size = model.replicate_size
+    rows = {}
+    while model.steps < MAX_STEPS and model.num_active:
+        model.step()
+        for r, run_number in enumerate(run_numbers):
+            if run_number not in rows and not model.active[r * size:(r + 1) * size].any():
+                rows[run_number] = agent_rows(model, run_number, model.steps, slice(r * size, (r + 1) * size))
+    for r, run_number in enumerate(run_numbers):
+        rows.setdefault(run_number, agent_rows(model, run_number, model.steps, slice(r * size, (r + 1) * size)))
+    return rows, model.replicate_steps
+
+
+@pytest.mark.parametrize('mode', [{'trading': 'batched'}, {'backend': 'jit'}, {'meeting': 'shuffle', 'trading': 'batched'}])
+def test_finished_replicates_stay_frozen(scenario, mode):
+    if mode.get('backend') == 'jit' and not jit.jit_available():
+        pytest.skip("numba is not installed")
+    # little starting wealth, so the replicates end at different steps well before MAX_STEPS
+    make_model = functools.partial(scenario.model_factory(), wealth=60, **mode)
+    behaviors = draw_behaviors(make_model, run_seed_sequence(SEED, 1))
+    run_numbers = list(range(1, REPLICATES + 1))
+    expected, steps = frozen_rows(make_model, behaviors, run_numbers)
+    assert len(set(steps.tolist())) > 1 and steps.max() < MAX_STEPS
+    for run_number, rows in run_batch(make_model, run_numbers, behaviors, MAX_STEPS, SEED):
+        assert rows[0]['Step Count'] == steps[run_number - 1]
+        assert rows == expected[run_number]
+
+
+def test_single_replicate_rows_unchanged(scenario):
+    # a batch of one is the lone run it replaces
+    make_model = functools.partial(scenario.model_factory(), wealth=60, trading='batched')
+    behaviors = draw_behaviors(make_model, run_seed_sequence(SEED, 1))
+    [(_, batch_rows)] = run_batch(make_model, [3], behaviors, MAX_STEPS, SEED)
+    model = make_model(agent_behaviors=behaviors, seed=run_seed_sequence(SEED, 3))
+    while model.steps < MAX_STEPS and model.num_active:
+        model.step()
+    assert batch_rows == agent_rows(model, 3, model.steps)
+    assert np.all(~model.active)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from engine.checkpoint import checkpoint_file, load_checkpoint, save_checkpoint
+from engine.convergence import AnyOf, DistributionChange, Quiescence
+from engine.runner import run_model
+
+SEED = 11
+MAX_STEPS = 3000
+
+
+def detector():
+    return AnyOf(Quiescence(steps=20), DistributionChange(epsilon=0.02, window=40))
+
+
+def test_resume_with_larger_max_steps(scenario, tmp_path):
+    make_model = scenario.model_factory()
+    expected = run_model(make_model, 1, max_steps=120, seed=SEED)
+    run_model(make_model, 1, max_steps=70, seed=SEED, checkpoint_dir=str(tmp_path), checkpoint_every=30)
+    # a completed run is returned as it is up to its own step limit, and continued beyond it
+    assert run_model(make_model, 1, max_steps=50, seed=SEED, checkpoint_dir=str(tmp_path))[0]['Step Count'] == 70
+    assert run_model(make_model, 1, max_steps=120, seed=SEED, checkpoint_dir=str(tmp_path)) == expected
+
+
+def test_resume_converges_at_the_same_step(scenario, tmp_path):
+    make_model = scenario.model_factory()
+    expected = run_model(make_model, 1, max_steps=MAX_STEPS, seed=SEED, convergence=detector())
+    steps = expected[0]['Step Count']
+    assert steps < MAX_STEPS
+    # interrupted between two windows of the distribution detector
+    run_model(make_model, 1, max_steps=steps - 25, seed=SEED, checkpoint_dir=str(tmp_path), checkpoint_every=30,
+              convergence=detector())
+    resumed = run_model(make_model, 1, max_steps=MAX_STEPS, seed=SEED, checkpoint_dir=str(tmp_path),
+                        checkpoint_every=30, convergence=detector())
+    assert resumed == expected
+    # a converged run stays finished whatever the step limit
+    assert run_model(make_model, 1, max_steps=MAX_STEPS + 100, seed=SEED, checkpoint_dir=str(tmp_path),
+                     convergence=detector()) == expected
+
+
+def test_checkpoint_without_convergence_state_warns(scenario, tmp_path):
+    make_model = scenario.model_factory()
+    model = make_model(seed=SEED)
+    model.step()
+    filename = checkpoint_file(str(tmp_path), 1)
+    save_checkpoint(model, filename)
+    with pytest.warns(RuntimeWarning, match='convergence detection restarts at step 1'):
+        load_checkpoint(make_model(seed=SEED), filename, convergence=detector())
+
+
+@pytest.mark.parametrize('movement_history', [True, 20])
+def test_checkpoint_keeps_the_movement_history(scenario, tmp_path, movement_history):
+    make_model = scenario.model_factory()
+    assert make_model(seed=SEED).history is None
+    model = make_model(seed=SEED, movement_history=movement_history)
+    for _ in range(30):
+        model.step()
+    filename = checkpoint_file(str(tmp_path), 1)
+    save_checkpoint(model, filename)
+    restored = make_model(seed=SEED, movement_history=movement_history)
+    load_checkpoint(restored, filename)
+    for expected, actual in zip(model.history.codes(), restored.history.codes()):
+        np.testing.assert_array_equal(expected, actual)
+    assert restored.history.agent(0) == model.history.agent(0)
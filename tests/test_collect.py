@@ -0,0 +1,63 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from engine.checkpoint import checkpoint_file
+from engine.collect import DataCollector
+from engine.runner import run_model
+
+SEED = 3
+INTERVAL = 5
+CAPACITY = 4
+
+
+def series(path):
+    return DataCollector(interval=INTERVAL, capacity=CAPACITY, path=str(path))
+
+
+def assert_same_series(actual, expected):
+    pd.testing.assert_frame_equal(actual.model_vars(), expected.model_vars())
+    pd.testing.assert_frame_equal(actual.agent_vars(), expected.agent_vars())
+    np.testing.assert_array_equal(actual.agent_array('Wealth'), expected.agent_array('Wealth'))
+
+
+def test_resumed_run_continues_the_series(scenario, tmp_path):
+    make_model = scenario.model_factory()
+    expected = series(tmp_path / 'expected')
+    run_model(make_model, 1, max_steps=120, seed=SEED, collector=expected)
+
+    checkpoints = str(tmp_path)
+    run_model(make_model, 1, max_steps=70, seed=SEED, checkpoint_dir=checkpoints, checkpoint_every=30,
+              collector=series(tmp_path / 'series'))
+    resumed = series(tmp_path / 'series')
+    run_model(make_model, 1, max_steps=120, seed=SEED, checkpoint_dir=checkpoints, collector=resumed)
+    assert_same_series(resumed, expected)
+
+
+def test_resume_drops_the_parts_after_the_checkpoint(scenario, tmp_path):
+    make_model = scenario.model_factory()
+    expected = series(tmp_path / 'expected')
+    run_model(make_model, 1, max_steps=100, seed=SEED, collector=expected)
+
+    checkpoints = str(tmp_path)
+    filename = checkpoint_file(checkpoints, 1)
+    run_model(make_model, 1, max_steps=30, seed=SEED, checkpoint_dir=checkpoints, collector=series(tmp_path / 'series'))
+    shutil.copy(filename, tmp_path / 'step_30.npz')
+    # a run killed at step 55: its series went on past the checkpoint of step 30
+    run_model(make_model, 1, max_steps=55, seed=SEED, checkpoint_dir=checkpoints, collector=series(tmp_path / 'series'))
+    shutil.copy(tmp_path / 'step_30.npz', filename)
+
+    resumed = series(tmp_path / 'series')
+    run_model(make_model, 1, max_steps=100, seed=SEED, checkpoint_dir=checkpoints, collector=resumed)
+    assert_same_series(resumed, expected)
+
+
+def test_new_run_replaces_the_series(scenario, tmp_path):
+    make_model = scenario.model_factory()
+    run_model(make_model, 1, max_steps=60, seed=SEED + 1, collector=series(tmp_path / 'series'))
+    expected = series(tmp_path / 'expected')
+    run_model(make_model, 1, max_steps=40, seed=SEED, collector=expected)
+    collector = series(tmp_path / 'series')
+    run_model(make_model, 1, max_steps=40, seed=SEED, collector=collector)
+    assert_same_series(collector, expected)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from engine.movement import choose_moves, sample_edges
+
+SEED = 5
+RUNS = 20
+STEPS = 50
+
+# nodes 0 and 1 have more edges than the sample, nodes 2 to 4 fewer
+INDPTR = np.array([0, 8, 16, 19, 22, 24])
+WEIGHT = np.ones(INDPTR[-1])
+
+
+@pytest.mark.parametrize('pos, moved_to', [
+    ([0, 2, 3, 4, 2, 3], 2),
+    ([2, 2, 3, 4, 2, 3], 0),
+    ([0, 0, 1, 3, 4, 1], 4),
+    ([1, 0, 1, 3, 4, 1], 0),
+])
+def test_aligned_samples_do_not_depend_on_other_agents(pos, moved_to):
+    pos = np.array(pos)
+    perturbed = pos.copy()
+    perturbed[0] = moved_to
+    rng, other_rng = np.random.default_rng(SEED), np.random.default_rng(SEED)
+    edges = sample_edges(rng, INDPTR, pos, aligned=True)
+    other_edges = sample_edges(other_rng, INDPTR, perturbed, aligned=True)
+    np.testing.assert_array_equal(edges[1:], other_edges[1:])
+    # the same number of draws, so whatever comes next draws the same numbers too
+    assert rng.bit_generator.state == other_rng.bit_generator.state
+
+
+def test_aligned_moves_do_not_depend_on_other_agents():
+    # every cost ties, so the choices of the agents on small nodes come from the tie draws
+    pos = np.array([0, 2, 3, 4, 2, 3])
+    perturbed = pos.copy()
+    perturbed[0] = 2
+    wealth = np.full(len(pos), 10.0)
+    edge, _ = choose_moves(np.random.default_rng(SEED), INDPTR, WEIGHT, pos, wealth, aligned=True)
+    other_edge, _ = choose_moves(np.random.default_rng(SEED), INDPTR, WEIGHT, perturbed, wealth, aligned=True)
+    np.testing.assert_array_equal(edge[1:], other_edge[1:])
+
+
+def test_crn_movement_does_not_depend_on_other_agents(scenario):
+    make_model = scenario.model_factory()
+    model, other = (make_model(seed=SEED, common_random_numbers=True) for _ in range(2))
+    network = other.network
+    other.pos[0] = network.indices[network.indptr[other.pos[0]]]
+    model.move_agents()
+    other.move_agents()
+    np.testing.assert_array_equal(model.pos[1:], other.pos[1:])
+    np.testing.assert_array_equal(model.wealth[1:], other.wealth[1:])
+
+
+def mean_wealth(model):
+    for _ in range(STEPS):
+        model.step()
+    return model.wealth.mean()
+
+
+def test_crn_reduces_the_variance_of_differences(scenario):
+    make_model = scenario.model_factory()
+    paired = [mean_wealth(make_model(seed=seed, wealth=510, common_random_numbers=True)) -
+              mean_wealth(make_model(seed=seed, common_random_numbers=True)) for seed in range(RUNS)]
+    unpaired = [mean_wealth(make_model(seed=seed, wealth=510)) - mean_wealth(make_model(seed=RUNS + seed))
+                for seed in range(RUNS)]
+    assert np.std(paired) < 0.8 * np.std(unpaired)
@@ -0,0 +1,38 @@
+import functools
+
+import numpy as np
+import pytest
+
+from conftest import run_engine, run_reference
+from engine import jit
+
+RUNS = 16
+STEPS = 100
+# allowed difference of the means, in standard errors of the difference
+TOLERANCE = 4
+
+MODES = {
+    'sequential': {'trading': 'sequential'},
+    'batched': {'trading': 'batched'},
+    'jit': {'backend': 'jit'},
+    'jit-workers': {'backend': 'jit', 'workers': 3},
+}
+
+
+@pytest.fixture(scope='module')
+def reference_state(reference, scenario):
+    G, incoming, outgoing = scenario.load_networks()
+    make_reference = functools.partial(reference.TestModelINTEST, G, scenario.agents_per_node(), incoming, outgoing)
+    return run_reference(make_reference, RUNS, STEPS)
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+def test_matches_reference(scenario, reference_state, mode):
+    """Mean final wealth and share of active agents agree with TestModelINTEST."""
+    if MODES[mode].get('backend') == 'jit' and not jit.jit_available():
+        pytest.skip("numba is not installed")
+    state = run_engine(functools.partial(scenario.model_factory(), **MODES[mode]), RUNS, STEPS)
+    error = np.sqrt(state.var(axis=0, ddof=1) / RUNS + reference_state.var(axis=0, ddof=1) / RUNS)
+    difference = np.abs(state.mean(axis=0) - reference_state.mean(axis=0))
+    assert np.all(difference <= TOLERANCE * error), (
+        f"{mode}: wealth and active share {state.mean(axis=0)} vs {reference_state.mean(axis=0)}")
@@ -0,0 +1,153 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from conftest import ROOT
+from engine import jit
+
+needs_numba = pytest.mark.skipif(not jit.jit_available(), reason="numba is not installed")
+
+SEED = 20250214
+
+
+def model_inputs(scenario, seed=SEED):
+    """Arrays of a Historical_Protectionism model after a few steps, as the kernels get them."""
+    model = scenario.model_factory()(seed=seed, trading='batched')
+    for _ in range(5):
+        model.step()
+    return model
+
+
+def run_both(kernel, make_args):
+    """
+    Run the compiled kernel and its py_func on fresh copies of the same arguments and
+    generators seeded alike. Returns (compiled arguments, plain arguments, results,
+    generators).
+    """
+    results, arguments, generators = [], [], []
+    for function in (kernel, kernel.py_func):
+        rng = np.random.default_rng(SEED)
+        args = make_args()
+        results.append(function(rng, *args))
+        arguments.append(args)
+        generators.append(rng)
+    return arguments, results, generators
+
+
+def assert_same(arguments, results, generators):
+    for compiled, plain in zip(*arguments):
+        np.testing.assert_array_equal(compiled, plain)
+    assert results[0] == results[1]
+    # both consumed the same numbers of the stream
+    assert generators[0].bit_generator.state == generators[1].bit_generator.state
+
+
+@needs_numba
+def test_choose_moves_kernel(scenario):
+    model = model_inputs(scenario)
+    network, n = model.network, model.num_agents
+    wealth = model.wealth.copy()
+    wealth[::7] = 0.5  # some agents cannot afford any move
+
+    def make_args():
+        return (network.indptr, network.weight, model.pos.copy(), wealth, np.zeros(n), np.ones(n), 5,
+                np.empty(n, dtype=np.int64), np.empty(n))
+
+    assert_same(*run_both(jit.choose_moves_kernel, make_args))
+
+
+@needs_numba
+@pytest.mark.parametrize('sample_size', [5, -1])
+def test_greedy_pairs_kernel(scenario, sample_size):
+    model = model_inputs(scenario)
+    order, bounds = model.agents_by_node()
+
+    def make_args():
+        return (order, bounds, model.type_id, model.cost_table, sample_size,
+                np.zeros(len(order) // 2, dtype=np.int64), np.zeros(len(order) // 2, dtype=np.int64))
+
+    assert_same(*run_both(jit.greedy_pairs_kernel, make_args))
+
+
+@needs_numba
+def test_shuffle_pairs_kernel(scenario):
+    model = model_inputs(scenario)
+    order, bounds = model.agents_by_node(active_only=False)
+
+    def make_args():
+        return (order, bounds, model.active, model.type_id,
+                np.zeros(len(order) // 2, dtype=np.int64), np.zeros(len(order) // 2, dtype=np.int64))
+
+    assert_same(*run_both(jit.shuffle_pairs_kernel, make_args))
+
+
+@needs_numba
+def test_settle_trades_kernel(scenario):
+    model = model_inputs(scenario)
+    order, bounds = model.agents_by_node()
+    first, second = jit.greedy_pairs(np.random.default_rng(SEED), order, bounds, model.type_id, model.cost_table, 5)
+    inventory = model.inventory
+
+    def make_args():
+        return (first, second, model.behavior, model.wealth.copy(), inventory.counts.copy(), inventory.sizes.copy(),
+                inventory.prices, np.zeros(len(first), dtype=np.int64), np.zeros(len(first), dtype=np.int64))
+
+    assert_same(*run_both(jit.settle_trades_kernel, make_args))
+
+
+@needs_numba
+def test_jit_model_is_reproducible(scenario):
+    make_model = scenario.model_factory()
+    models = [make_model(seed=SEED, backend='jit', workers=workers) for workers in (1, 1, 3, 3)]
+    for model in models:
+        for _ in range(50):
+            model.step()
+    for a, b in (models[:2], models[2:]):
+        np.testing.assert_array_equal(a.wealth, b.wealth)
+        np.testing.assert_array_equal(a.inventory.counts, b.inventory.counts)
+
+
+@needs_numba
+def test_runs_depend_on_the_number_of_workers(scenario):
+    # every worker has a stream of its own, so the same seed gives another run with more workers
+    make_model = scenario.model_factory()
+    one, three = (make_model(seed=SEED, backend='jit', workers=workers) for workers in (1, 3))
+    for _ in range(50):
+        one.step()
+        three.step()
+    assert not np.array_equal(one.wealth, three.wealth)
+
+
+def test_fallback_without_numba(scenario, monkeypatch):
+    make_model = scenario.model_factory()
+    monkeypatch.setattr(jit, 'numba', None)
+    with pytest.warns(RuntimeWarning, match='numba is not installed'):
+        model = make_model(seed=SEED, backend='jit')
+    assert (model.backend, model.trading) == ('numpy', 'batched')
+    expected = make_model(seed=SEED, trading='batched')
+    for _ in range(50):
+        model.step()
+        expected.step()
+    np.testing.assert_array_equal(model.wealth, expected.wealth)
+    np.testing.assert_array_equal(model.inventory.counts, expected.inventory.counts)
+
+
+def test_import_without_numba():
+    # with numba unimportable the kernels are the plain functions and the model falls back
+    code = (
+        "import sys, warnings\n"
+        "sys.modules['numba'] = None\n"
+        "from engine import jit\n"
+        "from engine.scenario import load_scenario\n"
+        "assert not jit.jit_available() and jit.settle_trades_kernel.py_func is jit.settle_trades_kernel\n"
+        "with warnings.catch_warnings(record=True) as caught:\n"
+        "    warnings.simplefilter('always')\n"
+        "    model = load_scenario('Historical_Protectionism').model_factory()(seed=1, backend='jit')\n"
+        "assert model.backend == 'numpy' and any(issubclass(w.category, RuntimeWarning) for w in caught)\n"
+        "for _ in range(10):\n"
+        "    model.step()\n"
+    )
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+